@@ -1,16 +1,40 @@
 import cv2
 import numpy as np
 import threading
-from collections import defaultdict, deque
+from collections import defaultdict
 import time
+import math
 import json
+import argparse
 import os
+from concurrent.futures import ThreadPoolExecutor
+from color_engine import ColorEngine, ContourMask, masked_median
+from edge_maps import EdgeMaps
+from contour_features import extract_features, classify_shapes
+from detection import Detection
+from tracking import match_detections
+from keyframes import FlowPropagator
+from motion_gate import MotionGate
+from track_cache import TrackAttributeCache
+from tiled_segmentation import tiled_mask, tiled_lookup, tiled_contours
+from info_panel import PanelRenderer
+from capture import ThreadedCapture
+from parallel_pipeline import ParallelPipeline
+from display import ResultThread
+from detection_log import DetectionLogWriter
+from count_history import CountHistory
+from profiling import NULL_CLOCK, StageTimers
+from frame_context import FrameContext, ScratchPool, lookup
+from governor import QualityGovernor
+from frame_sources import CameraSource, add_source_arguments, open_source
 
 class AdvancedMachineVision:
-    def __init__(self):
-        self.cap = cv2.VideoCapture(0)
+    def __init__(self, open_camera=True, source=None):
+        # Frame source, opened on first read (camera 0 unless another source is given)
+        self.cap = source if source is not None else (CameraSource(0) if open_camera else None)
         self.running = False
-        self.object_history = deque(maxlen=1000)
+        # Per-frame counts per "color shape" class, with rolling statistics
+        self.object_history = CountHistory(capacity=1000, windows=(30, 300))
         self.tracking_objects = {}
         self.next_id = 0
         
@@ -27,43 +51,126 @@ class AdvancedMachineVision:
             'White': [[(0, 0, 200), (180, 30, 255)]],
             'Black': [[(0, 0, 0), (180, 255, 50)]]
         }
+        self.color_engine = ColorEngine(self.color_ranges)
+        self.contour_mask = ContourMask()
         
         # Initialize counters
         self.frame_count = 0
         self.fps = 0
-        self.last_time = time.time()
+        self.last_time = time.perf_counter()
         
         # Detection parameters
         self.min_area = 300
         self.max_area = 50000
         
+        # How detections keep their contour: 'compressed', 'full' or 'none'
+        self.contour_mode = 'compressed'
+        
+        # Pyramid mode: threshold and find contours on a frame downscaled by this factor
+        # (1 = full resolution); color, hex and drawing still use the full-resolution frame
+        self.segmentation_scale = 1
+        # Re-segment each coarse contour's full-resolution ROI for an exact outline
+        self.segmentation_refine = True
+        # Threshold, contour tracing and refinement split into horizontal strips on this many
+        # threads (1 = whole frame on the calling thread); contours are the same either way
+        self.segmentation_threads = 1
+        self.segmentation_executor = None
+        
+        # Hex color from the 'median' or the cheaper 'mean' of the object's pixels
+        self.hex_statistic = 'median'
+        # Process one frame in frame_stride (others are dropped before detection)
+        self.frame_stride = 1
+        self.edge_maps_enabled = True
+        
+        # Latency budget per frame in ms (0 = off). A governor lowers the quality above while
+        # frames run over it, and restores it when there is headroom. With workers, a frame's
+        # cost is its detection time in the worker plus tracking here
+        self.frame_budget_ms = 0
+        self.governor = None
+        self.full_quality = None
+        
+        # Tracking: 'optimal' one-to-one assignment or the original 'greedy' matching
+        self.tracking_mode = 'optimal'
+        self.tracking_distance = 50  # Threshold for matching
+        
+        # Full detection every keyframe_interval frames (1 = every frame); objects are
+        # moved with optical flow in between. Applies when frames are processed serially.
+        self.keyframe_interval = 1
+        self.keyframe_motion = 40  # Pixels an object may move before forcing a keyframe
+        self.flow_propagator = FlowPropagator()
+        self.keyframes = 0
+        
+        # Motion gating: only the tiles that changed since the previous frame are analysed and
+        # objects elsewhere carry over; an unchanged frame skips detection. Serial processing only.
+        self.motion_gating = False
+        self.motion_gate = MotionGate()
+        # Changed regions covering more of the frame than this are analysed as one full frame
+        self.motion_full_share = 0.5
+        
+        # Reuse each track's shape, color and hex while its box, area and brightness stay within
+        # the cache's tolerances (see TrackAttributeCache). Serial processing only.
+        self.attribute_caching = False
+        self.attribute_cache = TrackAttributeCache()
+        
+        # Capture stage
+        self.capture_buffer_size = 2
+        self.capture_drop_policy = 'drop_oldest'
+        self.capture = None
+        
+        # Worker processes for detection (0 = process frames on the main thread)
+        self.workers = 0
+        
+        # Live display refresh rate in Hz (0 = show every result); detection is not throttled by it
+        self.display_rate = 15
+        # Draw contours, boxes and centers into processed frames (the live display draws its own)
+        self.draw_annotations = True
+        
+        # Per-stage timing of process_frame_advanced (a StageClock to enable it)
+        self.stage_clock = NULL_CLOCK
+        self.display_clock = NULL_CLOCK
+        
+        # Intermediate images (HSV, masks, labels) reuse these buffers while the frame size is unchanged
+        self.scratch = ScratchPool()
+        # Motion-gated regions, which change size from frame to frame, share buffers of the largest one
+        self.region_scratch = ScratchPool(reshape=True)
+        # Per-blob statistics go into pooled buffers too, at the cost of a second labelling pass
+        # (about 2 ms per 1080p frame); for runs where allocations matter more than speed
+        self.allocation_free = False
+        # Live loop keeps p50/p95/p99 per processing and display stage (False turns timing off)
+        self.stage_timing = True
+        
+        # Stream every processed frame to detection_logs/ ('ndjson', 'binary' or None)
+        self.detection_log_format = None
+        self.detection_log = None
+        self.frames_processed = 0
+        
+        # Info panel: static layer cached per resolution, drawn into a reused frame
+        self.panel = PanelRenderer(350, self.draw_panel_background)
+    
     def calculate_fps(self):
         """Calculate FPS"""
         self.frame_count += 1
-        current_time = time.time()
+        current_time = time.perf_counter()
         if current_time - self.last_time >= 1.0:
             self.fps = self.frame_count
             self.frame_count = 0
             self.last_time = current_time
     
-    def enhanced_color_detection(self, hsv_frame, contour):
+    def get_color_engine(self):
+        """Return the color engine, recompiling it if color_ranges was replaced"""
+        if self.color_engine.color_ranges is not self.color_ranges:
+            self.color_engine = ColorEngine(self.color_ranges)
+        return self.color_engine
+    
+    def enhanced_color_detection(self, hsv_frame, contour, label_map=None):
         """Enhanced color detection with better accuracy"""
-        mask = np.zeros(hsv_frame.shape[:2], dtype=np.uint8)
-        cv2.fillPoly(mask, [contour], 255)
+        # Pixel count per color inside the contour
+        counts = self.get_color_engine().contour_counts(contour, label_map=label_map, hsv_frame=hsv_frame)
         
         best_color = 'Unknown'
         max_pixels = 0
         
-        for color_name, ranges_list in self.color_ranges.items():
-            total_pixels = 0
-            
-            for ranges in ranges_list:
-                lower, upper = ranges
-                color_mask = cv2.inRange(hsv_frame, np.array(lower), np.array(upper))
-                intersection = cv2.bitwise_and(mask, color_mask)
-                pixels = cv2.countNonZero(intersection)
-                total_pixels += pixels
-            
+        for color_name, total_pixels in zip(self.color_engine.color_names, counts):
             if total_pixels > max_pixels and total_pixels > 100:
                 max_pixels = total_pixels
                 best_color = color_name
@@ -72,69 +179,27 @@ class AdvancedMachineVision:
     
     def advanced_shape_detection(self, contour):
         """Advanced shape detection with better accuracy"""
-        # Calculate contour properties
-        area = cv2.contourArea(contour)
-        perimeter = cv2.arcLength(contour, True)
-        
-        if perimeter == 0:
-            return "Unknown"
-        
-        # Approximate polygon
-        epsilon = 0.02 * perimeter
-        approx = cv2.approxPolyDP(contour, epsilon, True)
-        vertices = len(approx)
-        
-        # Calculate additional properties
-        hull = cv2.convexHull(contour)
-        hull_area = cv2.contourArea(hull)
-        solidity = area / hull_area if hull_area > 0 else 0
-        
-        # Bounding rectangle properties
-        x, y, w, h = cv2.boundingRect(contour)
-        aspect_ratio = w / h if h > 0 else 0
-        extent = area / (w * h) if (w * h) > 0 else 0
-        
-        # Circularity
-        circularity = 4 * np.pi * area / (perimeter * perimeter)
-        
-        # Shape classification
-        if vertices == 3:
-            return "Triangle"
-        elif vertices == 4:
-            if 0.95 <= aspect_ratio <= 1.05:
-                return "Square"
-            else:
-                return "Rectangle"
-        elif vertices == 5:
-            return "Pentagon"
-        elif vertices == 6:
-            return "Hexagon"
-        elif circularity > 0.7:
-            return "Circle"
-        elif circularity > 0.5:
-            return "Oval"
-        elif vertices > 6:
-            if solidity > 0.9:
-                return "Star"
-            else:
-                return "Complex"
-        else:
-            return "Irregular"
+        # Same rules as the batch path in detect_objects
+        features = extract_features([contour])
+        return str(classify_shapes(features)[0])
     
     def get_precise_hex_color(self, frame, contour):
         """Get precise hex color with statistical analysis"""
-        mask = np.zeros(frame.shape[:2], dtype=np.uint8)
-        cv2.fillPoly(mask, [contour], 255)
+        # Only the contour's bounding box is touched, so cost scales with object size
+        (x, y, w, h), mask = self.contour_mask.get(contour)
+        roi = frame[y:y + h, x:x + w]
         
-        # Get pixels within the contour
-        pixels = frame[mask > 0]
+        if self.hex_statistic == 'mean':
+            # One pass instead of three histograms; fillPoly always marks at least one pixel
+            median_color = np.array(cv2.mean(roi, mask)[:3])
+            pixel_count = 1
+        else:
+            # Calculate median color (more robust than mean)
+            median_color, pixel_count = masked_median(roi, mask)
         
-        if len(pixels) == 0:
+        if pixel_count == 0:
             return "#000000", [0, 0, 0]
         
-        # Calculate median color (more robust than mean)
-        median_color = np.median(pixels, axis=0)
-        
         # Convert BGR to hex
         hex_color = "#{:02x}{:02x}{:02x}".format(
             int(median_color[2]), int(median_color[1]), int(median_color[0])
@@ -145,47 +210,24 @@ class AdvancedMachineVision:
     def advanced_edge_detection(self, frame):
         """Advanced multi-level edge detection"""
         gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        edge_maps = EdgeMaps(gray)
         
-        # Apply different edge detection methods
-        # Canny
-        blurred = cv2.GaussianBlur(gray, (5, 5), 0)
-        canny = cv2.Canny(blurred, 50, 150)
-        
-        # Sobel
-        sobelx = cv2.Sobel(gray, cv2.CV_64F, 1, 0, ksize=3)
-        sobely = cv2.Sobel(gray, cv2.CV_64F, 0, 1, ksize=3)
-        sobel = np.sqrt(sobelx**2 + sobely**2)
-        sobel = np.uint8(sobel / sobel.max() * 255)
-        
-        # Laplacian
-        laplacian = cv2.Laplacian(gray, cv2.CV_64F)
-        laplacian = np.uint8(np.absolute(laplacian))
-        
-        # Combine edge detection results
-        combined = cv2.bitwise_or(canny, cv2.bitwise_or(sobel, laplacian))
-        
-        return canny, sobel, laplacian, combined
+        return edge_maps['canny'], edge_maps['sobel'], edge_maps['laplacian'], edge_maps['combined']
     
     def object_tracking(self, detected_objects):
-        """Simple object tracking between frames"""
+        """Object tracking between frames"""
         current_objects = {}
         
-        for obj in detected_objects:
-            center = obj['center']
-            matched_id = None
-            min_distance = float('inf')
-            
-            # Find closest existing object
-            for obj_id, tracked_obj in self.tracking_objects.items():
-                distance = np.sqrt((center[0] - tracked_obj['center'][0])**2 + 
-                                 (center[1] - tracked_obj['center'][1])**2)
-                
-                if distance < min_distance and distance < 50:  # Threshold for matching
-                    min_distance = distance
-                    matched_id = obj_id
-            
-            if matched_id is not None:
+        # Match all detections to tracked objects at once
+        track_ids = list(self.tracking_objects.keys())
+        track_centers = [self.tracking_objects[obj_id]['center'] for obj_id in track_ids]
+        centers = [obj['center'] for obj in detected_objects]
+        matches = match_detections(centers, track_centers, self.tracking_distance, self.tracking_mode)
+        
+        for obj, match in zip(detected_objects, matches):
+            if match >= 0:
                 # Update existing object
+                matched_id = track_ids[match]
                 obj['id'] = matched_id
                 obj['age'] = self.tracking_objects[matched_id]['age'] + 1
                 current_objects[matched_id] = obj
@@ -201,183 +243,464 @@ class AdvancedMachineVision:
     
     def process_frame_advanced(self, frame):
         """Advanced frame processing with multiple detection methods"""
-        height, width = frame.shape[:2]
-        hsv = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)
+        clock = self.stage_clock
+        clock.start()
         
-        # Advanced edge detection
-        canny, sobel, laplacian, combined_edges = self.advanced_edge_detection(frame)
+        # Multiple preprocessing methods, each computed once per frame. Gray needs its own memory
+        # only if it outlives the frame: as the flow keyframe, or for edge maps of a frame that
+        # detection is about to draw into
+        keep_gray = self.keyframe_interval > 1 or self.draw_annotations
+        context = FrameContext(frame, self.scratch, pooled_gray=not keep_gray)
+        gray = context.gray()
         
-        # Multiple preprocessing methods
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        # Edge maps are computed on first access only (e.g. when an edge window is shown)
+        edge_maps = EdgeMaps(gray) if keep_gray else EdgeMaps(frame=frame)
+        clock.lap('conversion')
         
-        # Method 1: Adaptive thresholding
-        adaptive_thresh = cv2.adaptiveThreshold(gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, 
-                                              cv2.THRESH_BINARY, 11, 2)
+        # Between keyframes, move the last detections with optical flow
+        if self.keyframe_interval > 1 and not self.flow_propagator.needs_keyframe(self.keyframe_interval):
+            tracked_objects = self.flow_propagator.propagate(gray, self.keyframe_motion)
+            clock.lap('flow')
+            if tracked_objects is not None:
+                object_counts = defaultdict(int)
+                for obj in tracked_objects:
+                    if self.draw_annotations:
+                        self.draw_detection(frame, obj, obj.contour)
+                    object_counts[f"{obj['color']} {obj['shape']}"] += 1
+                self.tracking_objects = {obj['id']: obj for obj in tracked_objects}
+                clock.lap('drawing')
+                context.report(clock)
+                return frame, tracked_objects, self.record_counts(object_counts), edge_maps
         
-        # Method 2: Morphological operations
-        kernel = np.ones((3,3), np.uint8)
-        morph = cv2.morphologyEx(adaptive_thresh, cv2.MORPH_CLOSE, kernel)
-        morph = cv2.morphologyEx(morph, cv2.MORPH_OPEN, kernel)
+        gated = self.detect_changed(frame, context) if self.motion_gating else None
+        if gated is None:
+            detected_objects, object_counts = self.detect_objects(frame, context)
+        else:
+            detected_objects, object_counts = gated
         
-        # Find contours
-        contours, _ = cv2.findContours(morph, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        # Object tracking
+        tracked_objects = self.object_tracking(detected_objects)
+        if self.attribute_caching:
+            self.attribute_cache.update(tracked_objects)
+        clock.lap('tracking')
+        
+        self.keyframes += 1
+        if self.keyframe_interval > 1:
+            self.flow_propagator.set_keyframe(gray, tracked_objects)
+            clock.lap('flow')
+        
+        context.report(clock)
+        return frame, tracked_objects, self.record_counts(object_counts), edge_maps
+    
+    def record_counts(self, object_counts):
+        """Add a frame's counts to the history and return them as stored"""
+        self.object_history.append(object_counts)
+        latest = self.object_history.latest()
+        self.stage_clock.lap('records')
+        return latest
+    
+    def detect_changed(self, frame, context):
+        """Detections from the changed regions of a frame plus the previous frame's objects
+        elsewhere, or None when the whole frame is to be analysed"""
+        clock = self.stage_clock
+        dirty = self.motion_gate.dirty_tiles(context.gray())
+        clock.lap('motion')
+        if dirty is None:
+            return None
+        
+        # The segmentation reads up to 9 px around a pixel (threshold block and morphology), so
+        # objects at least that far inside a region come out exactly as in the full frame
+        scale = max(1, int(self.segmentation_scale))
+        margin = 16 * scale
+        previous = list(self.tracking_objects.values())
+        height, width = frame.shape[:2]
+        regions, reached = self.motion_gate.regions(dirty, (height, width), [obj['bbox'] for obj in previous], margin)
+        if sum((x1 - x0) * (y1 - y0) for x0, y0, x1, y1 in regions) > self.motion_full_share * height * width:
+            return None
         
         detected_objects = []
         object_counts = defaultdict(int)
+        band = margin // 2 + 1
+        # Region detections queued in the attribute cache are dropped if the frame is analysed whole
+        cache_mark = self.attribute_cache.mark()
+        for region in regions:
+            x0, y0, x1, y1 = region
+            objects, counts = self.detect_objects(frame, region=region)
+            for obj in objects:
+                # An object reaching into a region's border band may continue outside it
+                x, y, w, h = obj['bbox']
+                if ((x0 > 0 and x < x0 + band) or (y0 > 0 and y < y0 + band)
+                        or (x1 < width and x + w > x1 - band) or (y1 < height and y + h > y1 - band)):
+                    self.attribute_cache.rollback(cache_mark)
+                    return None
+            detected_objects += objects
+            for key, count in counts.items():
+                object_counts[key] += count
         
-        for contour in contours:
-            area = cv2.contourArea(contour)
-            
-            # Filter by area
-            if area < self.min_area or area > self.max_area:
-                continue
+        # Objects no region reached are unchanged; copies, since tracking sets the ID and age of
+        # this frame's objects and the previous frame's results may still be in use
+        for index, obj in enumerate(previous):
+            if index not in reached:
+                detected_objects.append(obj.copy())
+                object_counts[f"{obj['color']} {obj['shape']}"] += 1
+        if self.draw_annotations:
+            for obj in detected_objects:
+                self.draw_detection(frame, obj, obj.contour)
+        clock.lap('drawing')
+        return detected_objects, object_counts
+    
+    def detect_objects(self, frame, context=None, region=None):
+        """Detect, classify and draw the objects of one frame, or of its (x0, y0, x1, y1) region (no tracking)"""
+        clock = self.stage_clock
+        if region is not None:
+            # Analysis runs on the region; contours and boxes are returned in frame coordinates
+            x0, y0, x1, y1 = region
+            image = frame[y0:y1, x0:x1]
+            context = FrameContext(image, self.region_scratch)
+        else:
+            x0, y0 = 0, 0
+            image = frame
+        if context is None:
+            context = FrameContext(frame, self.scratch)
+        hsv = context.hsv()
+        context.gray()
+        clock.lap('conversion')
+        
+        # Classify every pixel once; contours are scored from this label map
+        color_labels = self.get_color_engine().classify(hsv, dst=context.scratch('color_labels'))
+        clock.lap('color')
+        
+        contours, areas = self.segment(context)
+        
+        detected_objects = []
+        object_counts = defaultdict(int)
+        
+        # Every geometric feature once per contour, then vectorized shape rules
+        features = extract_features(contours, areas)
+        shapes = classify_shapes(features)
+        clock.lap('shape')
+        
+        cache = self.attribute_cache if self.attribute_caching else None
+        if cache is not None:
+            gray = context.gray()
+            centers = [(int(f['x']) + x0 + int(f['w']) // 2, int(f['y']) + y0 + int(f['h']) // 2) for f in features]
+            track_ids = cache.predict(centers, self.tracking_objects, self.tracking_distance, self.tracking_mode)
+            clock.lap('cache')
+        
+        for index, (contour, feature, shape) in enumerate(zip(contours, features, shapes)):
+            area = float(feature['area'])
+            perimeter = float(feature['perimeter'])
+            circularity = feature['circularity']
+            shape = str(shape)
             
             # Get contour properties
-            x, y, w, h = cv2.boundingRect(contour)
+            x, y, w, h = int(feature['x']) + x0, int(feature['y']) + y0, int(feature['w']), int(feature['h'])
             center_x, center_y = x + w//2, y + h//2
             
-            # Advanced shape detection
-            shape = self.advanced_shape_detection(contour)
-            
-            # Enhanced color detection
-            color = self.enhanced_color_detection(hsv, contour)
-            
-            # Precise hex color
-            hex_color, median_color = self.get_precise_hex_color(frame, contour)
-            
-            # Calculate additional properties
-            perimeter = cv2.arcLength(contour, True)
-            circularity = 4 * np.pi * area / (perimeter * perimeter) if perimeter > 0 else 0
-            
-            # Draw enhanced visualization
-            # Contour outline
-            cv2.drawContours(frame, [contour], -1, (0, 255, 0), 2)
-            
-            # Bounding box
-            cv2.rectangle(frame, (x, y), (x + w, y + h), (255, 0, 0), 2)
-            
-            # Center point
-            cv2.circle(frame, (center_x, center_y), 7, (0, 0, 255), -1)
-            cv2.circle(frame, (center_x, center_y), 3, (255, 255, 255), -1)
+            entry = None
+            if cache is not None:
+                intensity = cv2.mean(gray[y - y0:y - y0 + h, x - x0:x - x0 + w])[0]
+                entry = cache.lookup(track_ids[index], (x, y, w, h), area, intensity)
+                clock.lap('cache')
+            if entry is not None:
+                # Same object as when its track was last classified
+                shape, color, hex_color, median_color = entry['attributes']
+            else:
+                # Enhanced color detection
+                color = self.enhanced_color_detection(hsv, contour, color_labels)
+                clock.lap('color')
+                
+                # Precise hex color
+                hex_color, median_color = self.get_precise_hex_color(image, contour)
+                clock.lap('hex')
+            if region is not None:
+                contour = contour + np.array([x0, y0], dtype=contour.dtype)
             
             # Store detailed object info
-            obj_info = {
-                'shape': shape,
-                'color': color,
-                'hex': hex_color,
-                'area': area,
-                'perimeter': perimeter,
-                'circularity': circularity,
-                'center': (center_x, center_y),
-                'bbox': (x, y, w, h),
-                'contour': contour,
-                'median_color': median_color
-            }
+            obj_info = Detection(shape, color, hex_color, area, (center_x, center_y), (x, y, w, h),
+                                 perimeter=perimeter, circularity=circularity, median_color=median_color,
+                                 contour=contour, contour_mode=self.contour_mode)
             detected_objects.append(obj_info)
+            if cache is not None:
+                cache.add(obj_info, intensity, entry)
             
             # Count objects
             object_key = f"{color} {shape}"
             object_counts[object_key] += 1
+            clock.lap('records')
+            
+            # Draw enhanced visualization (the caller draws region objects once all regions are done)
+            if self.draw_annotations and region is None:
+                self.draw_detection(frame, obj_info, contour)
+            clock.lap('drawing')
         
-        # Object tracking
-        tracked_objects = self.object_tracking(detected_objects)
+        return detected_objects, object_counts
+    
+    def threshold_mask(self, gray, block_size=11, kernel_size=3, context=None):
+        """Binary object mask: adaptive threshold cleaned up with morphology"""
+        # Whole-frame masks are written to the frame context's scratch buffers, ROI masks to new arrays
+        def buffer(name):
+            return context.scratch((name, gray.shape), gray.shape) if context is not None else None
         
-        return frame, tracked_objects, object_counts, {
-            'canny': canny,
-            'sobel': sobel,
-            'laplacian': laplacian,
-            'combined': combined_edges
-        }
+        # Method 1: Adaptive thresholding
+        adaptive_thresh = cv2.adaptiveThreshold(gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, 
+                                              cv2.THRESH_BINARY, block_size, 2, dst=buffer('adaptive'))
+        
+        # Method 2: Morphological operations
+        if kernel_size < 2:
+            return adaptive_thresh
+        kernel = np.ones((kernel_size, kernel_size), np.uint8)
+        morph = cv2.morphologyEx(adaptive_thresh, cv2.MORPH_CLOSE, kernel, dst=buffer('close'))
+        morph = cv2.morphologyEx(morph, cv2.MORPH_OPEN, kernel, dst=buffer('open'))
+        return morph
     
-    def draw_advanced_info_panel(self, frame, detected_objects, object_counts):
-        """Draw advanced information panel with detailed stats"""
-        height, width = frame.shape[:2]
-        panel_width = 350
+    def segmentation_pool(self):
+        """Thread pool of tiled segmentation, created on first use"""
+        threads = max(1, int(self.segmentation_threads))
+        if self.segmentation_executor is None or self.segmentation_executor._max_workers != threads:
+            if self.segmentation_executor is not None:
+                self.segmentation_executor.shutdown()
+            self.segmentation_executor = ThreadPoolExecutor(threads, thread_name_prefix="segmentation")
+        return self.segmentation_executor
+    
+    def segment(self, context):
+        """Object contours within the area limits and their areas, in full-resolution coordinates"""
+        clock = self.stage_clock
+        gray = context.gray()
+        scale = max(1, int(self.segmentation_scale))
+        threads = max(1, int(self.segmentation_threads))
+        if scale > 1:
+            size = (gray.shape[1] // scale, gray.shape[0] // scale)
+            image = context.derived(('gray', scale), lambda: cv2.resize(
+                gray, size, dst=context.scratch(('gray', scale), size[::-1]), interpolation=cv2.INTER_AREA))
+            # Same neighbourhoods in full-resolution pixels; the 3x3 clean-up falls below a pixel
+            block_size, kernel_size = max(3, (11 // scale) | 1), 3 // scale
+        else:
+            image, block_size, kernel_size = gray, 11, 3
+        if threads > 1:
+            # Strips overlap by the rows the threshold block and the close and open reach
+            halo = block_size // 2 + 4 * (kernel_size // 2)
+            mask = context.derived(('mask', scale), lambda: tiled_mask(
+                image, lambda strip: self.threshold_mask(strip, block_size, kernel_size), self.segmentation_pool(),
+                threads, halo, context.scratch(('tiled mask', scale), image.shape)))
+        else:
+            mask = context.derived(('mask', scale), lambda: self.threshold_mask(image, block_size, kernel_size, context))
+        clock.lap('threshold')
         
-        # Create extended frame
-        extended_frame = np.zeros((height, width + panel_width, 3), dtype=np.uint8)
-        extended_frame[:, :width] = frame
+        # Drop blobs whose bounding box is below min_area before tracing them; a contour never
+        # encloses more than its bounding box, so no object is lost, and noise costs no contourArea
+        pixel_area = scale * scale
+        labels = context.scratch(('labels', scale), mask.shape, np.int32)
+        if self.allocation_free:
+            # A plain labelling first counts the blobs, so their stats go into pooled rows rather
+            # than arrays sized anew for every frame (noise can make thousands of blobs)
+            count = cv2.connectedComponents(mask, labels=labels, connectivity=8)[0]
+            stats = context.pool.rows(('stats', scale), count, (5,))
+            cv2.connectedComponentsWithStats(mask, labels=labels, stats=stats, connectivity=8,
+                                             centroids=context.pool.rows(('centroids', scale), count, (2,), np.float64))
+        else:
+            count, _, stats, _ = cv2.connectedComponentsWithStats(mask, labels=labels, connectivity=8)
+        boxes = np.multiply(stats[:, cv2.CC_STAT_WIDTH], stats[:, cv2.CC_STAT_HEIGHT],
+                            out=context.pool.rows(('boxes', scale), count))
+        large = np.greater_equal(boxes, math.ceil(self.min_area / pixel_area),
+                                 out=context.pool.rows(('large', scale), count, dtype=bool))
+        large[0] = False
+        if not large.all():
+            table = context.pool.rows(('table', scale), count, dtype=np.uint8)
+            np.copyto(table, large)
+            table *= 255
+            out = context.scratch(('objects', scale), mask.shape)
+            index = context.scratch(('label index', scale), mask.shape, np.intp)
+            if threads > 1:
+                mask = tiled_lookup(table, labels, self.segmentation_pool(), threads, out, index)
+            else:
+                mask = lookup(table, labels, out, index)
+        
+        # Find contours
+        if threads > 1:
+            contours = tiled_contours(mask, labels, stats, large, self.segmentation_pool(), threads)
+        else:
+            contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        
+        # Filter by area, with the limits converted to the segmentation resolution
+        areas = np.array([cv2.contourArea(contour) for contour in contours])
+        keep = np.flatnonzero((areas >= self.min_area / pixel_area) & (areas <= self.max_area / pixel_area))
+        contours = [contours[i] for i in keep]
+        areas = areas[keep] * pixel_area
+        
+        if scale > 1:
+            # Contour points move to the centers of the pixel blocks they stand for
+            contours = [contour * scale + scale // 2 for contour in contours]
+            if self.segmentation_refine:
+                contours, areas = self.refine_contours(gray, contours, areas, scale)
+        clock.lap('contours')
+        return contours, areas
+    
+    def refine_contours(self, gray, contours, areas, scale):
+        """Replace coarse contours by the full-resolution outline found in each one's ROI"""
+        def refine(item):
+            return self.refine_contour(gray, item[0], item[1], scale)
+        
+        if self.segmentation_threads > 1:
+            results = list(self.segmentation_pool().map(refine, zip(contours, areas)))
+        else:
+            results = [refine(item) for item in zip(contours, areas)]
+        return [contour for contour, _ in results], np.array([area for _, area in results], dtype=np.float64)
+    
+    def refine_contour(self, gray, contour, area, scale):
+        """Full-resolution outline and area of one coarse contour, or the contour itself if none is found"""
+        height, width = gray.shape
+        # The full-resolution threshold looks 5 px around each pixel, plus the coarse contour's error
+        margin = 2 * scale + 8
+        x, y, w, h = cv2.boundingRect(contour)
+        x0, y0 = max(0, x - margin), max(0, y - margin)
+        x1, y1 = min(width, x + w + margin), min(height, y + h + margin)
+        _, labels = cv2.connectedComponents(self.threshold_mask(gray[y0:y1, x0:x1]), connectivity=8)
+        
+        # The object is the full-resolution blob covering most of the coarse contour
+        coarse = np.zeros(labels.shape, dtype=np.uint8)
+        cv2.drawContours(coarse, [contour], -1, 1, -1, offset=(-x0, -y0))
+        votes = np.bincount(labels[coarse > 0], minlength=2)
+        votes[0] = 0
+        best_area = 0.0
+        if votes.any():
+            blob = (labels == votes.argmax()).astype(np.uint8)
+            best = cv2.findContours(blob, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE, offset=(x0, y0))[0][0]
+            best_area = cv2.contourArea(best)
+        
+        # Keep the coarse contour if no blob within the area limits was found
+        if self.min_area <= best_area <= self.max_area:
+            return best, best_area
+        return contour, area
+    
+    def draw_detection(self, frame, obj, contour=None):
+        """Draw an object's contour outline, bounding box and center point"""
+        x, y, w, h = obj['bbox']
+        center_x, center_y = obj['center']
+        
+        # Contour outline
+        if contour is not None:
+            cv2.drawContours(frame, [contour], -1, (0, 255, 0), 2)
+        
+        # Bounding box
+        cv2.rectangle(frame, (x, y), (x + w, y + h), (255, 0, 0), 2)
+        
+        # Center point
+        cv2.circle(frame, (center_x, center_y), 7, (0, 0, 255), -1)
+        cv2.circle(frame, (center_x, center_y), 3, (255, 255, 255), -1)
+    
+    def draw_panel_background(self, panel):
+        """Static part of the info panel: gradient background and header"""
+        height, panel_width = panel.shape[:2]
         
         # Panel background with gradient
-        for i in range(height):
-            intensity = int(30 + (i / height) * 20)
-            extended_frame[i, width:] = [intensity, intensity, intensity]
+        intensity = (30 + (np.arange(height) / height) * 20).astype(np.uint8)
+        panel[:] = intensity[:, None, None]
         
         # Header
-        cv2.rectangle(extended_frame, (width, 0), (width + panel_width, 80), (0, 100, 200), -1)
-        cv2.putText(extended_frame, "TEAM-AETHERION - UOWD AEROSPACE", (width + 10, 25), 
+        cv2.rectangle(panel, (0, 0), (panel_width, 80), (0, 100, 200), -1)
+        cv2.putText(panel, "TEAM-AETHERION - UOWD AEROSPACE", (10, 25), 
                    cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
-        cv2.putText(extended_frame, "Advanced Machine Vision", (width + 10, 45), 
+        cv2.putText(panel, "Advanced Machine Vision", (10, 45), 
                    cv2.FONT_HERSHEY_SIMPLEX, 0.5, (200, 200, 255), 1)
-        cv2.putText(extended_frame, f"FPS: {self.fps}", (width + 10, 65), 
-                   cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
+        
+        # Object type counts
+        cv2.putText(panel, "Object Counts:", (10, 130), 
+                   cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 1)
+    
+    def draw_advanced_info_panel(self, frame, detected_objects, object_counts):
+        """Draw advanced information panel with detailed stats"""
+        # The returned frame is a buffer reused on the next call
+        panel = self.panel
+        extended_frame = panel.begin(frame)
+        
+        panel.text(f"FPS: {self.fps}", (10, 65), 0.5, (255, 255, 255), 1)
+        if self.capture is not None:
+            p95 = self.capture.latency_percentiles((95,))[95]
+            panel.text(f"Lat p95: {p95:.0f}ms  Drop: {self.capture.dropped}", (100, 65), 0.45, (255, 255, 255), 1)
         
         y_offset = 100
         
         # Summary statistics
         total_objects = len(detected_objects)
-        cv2.putText(extended_frame, f"Total Objects: {total_objects}", (width + 10, y_offset), 
-                   cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 255), 2)
-        y_offset += 30
-        
-        # Object type counts
-        cv2.putText(extended_frame, "Object Counts:", (width + 10, y_offset), 
-                   cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 1)
-        y_offset += 20
+        panel.text(f"Total Objects: {total_objects}", (10, y_offset), 0.6, (0, 255, 255), 2)
+        if len(self.object_history):
+            recent = self.object_history.rolling(30)
+            total = CountHistory.total_name
+            panel.text(f"avg {recent['mean'][total]:.1f} ({recent['min'][total]}-{recent['max'][total]})", 
+                       (220, y_offset), 0.4, (200, 200, 200), 1)
+        y_offset += 50
         
         for obj_type, count in list(object_counts.items())[:6]:
-            cv2.putText(extended_frame, f"  {obj_type}: {count}", (width + 15, y_offset), 
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.4, (255, 255, 255), 1)
+            panel.text(f"  {obj_type}: {count}", (15, y_offset), 0.4, (255, 255, 255), 1)
             y_offset += 18
         
         y_offset += 10
         
+        # Stage timings at the bottom; object details fill the space above them
+        details_end = self.draw_stage_timings(panel, frame.shape[0])
+        if self.governor is not None:
+            color = (0, 255, 0) if self.governor.level == 0 else (0, 165, 255)
+            panel.text(f"Quality {self.governor.describe()}", (10, details_end), 0.45, color, 1)
+            details_end -= 20
+        
         # Individual object details
-        cv2.putText(extended_frame, "Detailed Analysis:", (width + 10, y_offset), 
-                   cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 0), 1)
+        panel.text("Detailed Analysis:", (10, y_offset), 0.5, (255, 255, 0), 1)
         y_offset += 25
         
         for i, obj in enumerate(detected_objects[:6]):
+            if y_offset + 50 > details_end:
+                break
             if 'id' in obj:
-                cv2.putText(extended_frame, f"ID-{obj['id']}: {obj['color']} {obj['shape']}", 
-                           (width + 10, y_offset), cv2.FONT_HERSHEY_SIMPLEX, 0.4, (255, 255, 255), 1)
+                panel.text(f"ID-{obj['id']}: {obj['color']} {obj['shape']}", (10, y_offset), 0.4, (255, 255, 255), 1)
             else:
-                cv2.putText(extended_frame, f"Obj-{i+1}: {obj['color']} {obj['shape']}", 
-                           (width + 10, y_offset), cv2.FONT_HERSHEY_SIMPLEX, 0.4, (255, 255, 255), 1)
+                panel.text(f"Obj-{i+1}: {obj['color']} {obj['shape']}", (10, y_offset), 0.4, (255, 255, 255), 1)
             y_offset += 15
             
             # Properties
-            cv2.putText(extended_frame, f"  Area: {int(obj['area'])}", 
-                       (width + 15, y_offset), cv2.FONT_HERSHEY_SIMPLEX, 0.35, (200, 200, 200), 1)
+            panel.text(f"  Area: {int(obj['area'])}", (15, y_offset), 0.35, (200, 200, 200), 1)
             y_offset += 12
             
-            cv2.putText(extended_frame, f"  Hex: {obj['hex']}", 
-                       (width + 15, y_offset), cv2.FONT_HERSHEY_SIMPLEX, 0.35, (200, 200, 200), 1)
+            panel.text(f"  Hex: {obj['hex']}", (15, y_offset), 0.35, (200, 200, 200), 1)
             
             # Color swatch
             try:
                 color_bgr = [int(obj['hex'][5:7], 16), int(obj['hex'][3:5], 16), int(obj['hex'][1:3], 16)]
-                cv2.rectangle(extended_frame, (width + 200, y_offset - 10), (width + 230, y_offset + 2), color_bgr, -1)
-                cv2.rectangle(extended_frame, (width + 200, y_offset - 10), (width + 230, y_offset + 2), (255, 255, 255), 1)
+                panel.rectangle((200, y_offset - 10), (230, y_offset + 2), color_bgr, -1)
+                panel.rectangle((200, y_offset - 10), (230, y_offset + 2), (255, 255, 255), 1)
             except:
                 pass
             
             y_offset += 15
             
             if 'circularity' in obj:
-                cv2.putText(extended_frame, f"  Circularity: {obj['circularity']:.2f}", 
-                           (width + 15, y_offset), cv2.FONT_HERSHEY_SIMPLEX, 0.35, (150, 150, 150), 1)
+                panel.text(f"  Circularity: {obj['circularity']:.2f}", (15, y_offset), 0.35, (150, 150, 150), 1)
                 y_offset += 12
             
             y_offset += 8
         
         return extended_frame
     
-    def save_detection_data(self, detected_objects, filename_prefix="detection"):
-        """Save detection data to JSON file"""
-        timestamp = int(time.time())
-        filename = f"{filename_prefix}_{timestamp}.json"
+    def draw_stage_timings(self, panel, height, rows=4):
+        """Bottom of the panel: p50/p95/p99 of the frame total, slowest stages and display; returns its top"""
+        timings = list(self.stage_clock.percentiles().items())[:rows]
+        timings += list(self.display_clock.percentiles().items())[:1]
+        if not timings:
+            return height
         
+        top = height - 14 * len(timings) - 12
+        y_offset = top
+        for x, label in ((10, "Stage ms"), (150, "p50"), (210, "p95"), (270, "p99")):
+            panel.text(label, (x, y_offset), 0.4, (0, 255, 0), 1)
+        for stage, values in timings:
+            y_offset += 14
+            panel.text(stage, (10, y_offset), 0.35, (200, 200, 200), 1)
+            for x, p in ((150, 50), (210, 95), (270, 99)):
+                panel.text(f"{values[p]:.1f}", (x, y_offset), 0.35, (200, 200, 200), 1)
+        return top - 15
+    
+    def serialize_objects(self, detected_objects, timestamp):
+        """Convert detections to JSON-serializable dicts"""
         # Prepare data for JSON (remove non-serializable objects)
         data = []
         for obj in detected_objects:
@@ -398,11 +721,120 @@ class AdvancedMachineVision:
             
             data.append(obj_data)
         
+        return data
+    
+    def save_detection_data(self, detected_objects, filename_prefix="detection"):
+        """Save detection data to JSON file"""
+        timestamp = int(time.time())
+        filename = f"{filename_prefix}_{timestamp}.json"
+        
+        data = self.serialize_objects(detected_objects, timestamp)
+        
+        with open(filename, 'w') as f:
+            json.dump(data, f, indent=2)
+        
+        return filename
+    
+    def save_count_history(self, filename_prefix="count_history"):
+        """Save the stored per-frame counts and rolling statistics to a JSON file"""
+        timestamp = int(time.time())
+        filename = f"{filename_prefix}_{timestamp}.json"
+        
+        data = self.object_history.to_dict()
+        data['rolling'] = {window: self.object_history.rolling(window) for window in self.object_history.windows}
+        
+        with open(filename, 'w') as f:
+            json.dump(data, f)
+        
+        return filename
+    
+    def save_stage_timings(self, filename_prefix="stage_timings"):
+        """Save per-stage latency percentiles of processing and display to a JSON file"""
+        timestamp = int(time.time())
+        filename = f"{filename_prefix}_{timestamp}.json"
+        
+        data = {
+            'processing': self.stage_clock.to_dict(),
+            'display': self.display_clock.to_dict()
+        }
+        
         with open(filename, 'w') as f:
             json.dump(data, f, indent=2)
         
         return filename
     
+    def captured_frames(self):
+        """Yield (frame, capture_time) from the capture thread until it stops"""
+        while self.running:
+            ret, frame, capture_time = self.capture.read()
+            if not ret:
+                if self.running:
+                    # Recorded and generated sources simply run out
+                    print("Failed to capture frame" if getattr(self.cap, 'live', True) else "End of frames")
+                return
+            yield frame, capture_time
+    
+    def strided_frames(self, frames, skip=None):
+        """Drop all but one frame in frame_stride; the governor counts dropped frames as free,
+        through skip() if given"""
+        for index, (frame, tag) in enumerate(frames):
+            if self.frame_stride > 1 and index % self.frame_stride:
+                if skip is not None:
+                    skip()
+                elif self.governor is not None:
+                    self.governor.update(0.0)
+                continue
+            yield frame, tag
+    
+    def start_governor(self):
+        """Create the quality governor for frame_budget_ms, remembering the full-quality settings"""
+        self.full_quality = {
+            'edge_maps_enabled': self.edge_maps_enabled,
+            'segmentation_scale': self.segmentation_scale,
+            'segmentation_refine': self.segmentation_refine,
+            'frame_stride': self.frame_stride,
+            'hex_statistic': self.hex_statistic
+        }
+        self.governor = QualityGovernor(self.frame_budget_ms, on_change=self.apply_quality)
+        return self.governor
+    
+    def apply_quality(self, level, previous=None, mean_ms=None):
+        """Settings of a governor level; every level keeps the reductions of the ones before it"""
+        full = self.full_quality
+        self.edge_maps_enabled = full['edge_maps_enabled'] and level < 1
+        # Refinement re-segments every object at full resolution, which would undo most of the saving
+        self.segmentation_scale = full['segmentation_scale'] * 2 if level >= 2 else full['segmentation_scale']
+        self.segmentation_refine = full['segmentation_refine'] and level < 2
+        self.frame_stride = max(2, full['frame_stride']) if level >= 3 else full['frame_stride']
+        self.hex_statistic = 'mean' if level >= 4 else full['hex_statistic']
+        if previous is not None:
+            direction = "down" if level > previous else "up"
+            print(f"Quality {direction} to {self.governor.describe(level)}: {mean_ms:.1f} ms per frame, "
+                  f"budget {self.governor.budget_ms:.0f} ms")
+    
+    def iter_results(self, frames=None):
+        """Yield (tag, frame, objects, counts, edge_maps) for (frame, tag) pairs in order"""
+        if frames is None:
+            frames = self.captured_frames()
+        
+        if self.workers <= 0:
+            for frame, tag in self.strided_frames(frames):
+                start = time.perf_counter()
+                result = (tag,) + self.process_frame_advanced(frame)
+                if self.governor is not None:
+                    self.governor.update((time.perf_counter() - start) * 1000)
+                yield result
+            return
+        
+        # Detection runs on the worker pool; tracking stays on this thread, where the pipeline
+        # also updates the governor, skipped frames included
+        pipeline = ParallelPipeline(self, self.workers).start()
+        try:
+            for result in pipeline.process(self.strided_frames(frames, pipeline.skip)):
+                yield result
+        finally:
+            pipeline.close()
+    
     def start_advanced_detection(self):
         """Start advanced detection system"""
         self.running = True
@@ -415,37 +847,70 @@ class AdvancedMachineVision:
         print("  '2' - Show Sobel edges")
         print("  '3' - Show Laplacian edges")
         print("  '4' - Show combined edges")
+        print("  'h' - Save count history")
+        print("  'p' - Save stage timings")
         
         show_edges = None
+        display_frame = None
+        detected_objects = []
+        period = 1.0 / self.display_rate if self.display_rate > 0 else 0.0
         
-        while self.running:
-            ret, frame = self.cap.read()
-            if not ret:
-                print("Failed to capture frame")
+        # Frames are grabbed on a capture thread so slow processing drops stale frames
+        self.capture = ThreadedCapture(self.cap, self.capture_buffer_size, self.capture_drop_policy).start()
+        
+        # Detection runs on its own thread as fast as it can; this thread renders and
+        # displays the newest result at display_rate (HighGUI stays on the main thread)
+        self.draw_annotations = False
+        if self.frame_budget_ms > 0:
+            self.start_governor()
+        if self.stage_timing:
+            self.stage_clock = StageTimers()
+            self.display_clock = StageTimers(total_stage='display')
+        if self.detection_log_format:
+            self.detection_log = DetectionLogWriter(os.path.join('detection_logs', 'detections'),
+                                                    self.detection_log_format, self.serialize_objects).start()
+        detection = ResultThread(self.iter_results(), self.record_result).start()
+        
+        while True:
+            display_start = time.perf_counter()
+            result = detection.latest.take(timeout=0.1)
+            if result is None and detection.finished:
                 break
             
-            # Calculate FPS
-            self.calculate_fps()
-            
-            # Process frame
-            processed_frame, detected_objects, object_counts, edge_maps = self.process_frame_advanced(frame.copy())
-            
-            # Draw info panel
-            display_frame = self.draw_advanced_info_panel(processed_frame, detected_objects, object_counts)
-            
-            # Display main frame
-            cv2.imshow('Team-Aetherion - UOWD Aerospace Advanced Machine Vision', display_frame)
-            
-            # Show edge detection if requested
-            if show_edges and show_edges in edge_maps:
-                edge_display = cv2.cvtColor(edge_maps[show_edges], cv2.COLOR_GRAY2BGR)
-                cv2.imshow(f'Edge Detection - {show_edges.title()}', edge_display)
+            if result is not None:
+                _, processed_frame, detected_objects, object_counts, edge_maps = result
+                clock = self.display_clock
+                clock.start()
+                
+                # Draw info panel
+                display_frame = self.draw_advanced_info_panel(processed_frame, detected_objects, object_counts)
+                clock.lap('panel')
+                
+                # Contours, boxes and centers go over the frame part of the display buffer only
+                frame_area = display_frame[:, :processed_frame.shape[1]]
+                for obj in detected_objects:
+                    self.draw_detection(frame_area, obj, obj.contour)
+                clock.lap('annotate')
+                
+                # Display main frame
+                cv2.imshow('Team-Aetherion - UOWD Aerospace Advanced Machine Vision', display_frame)
+                
+                # Show edge detection if requested
+                if show_edges and self.edge_maps_enabled and show_edges in edge_maps:
+                    cv2.imshow(f'Edge Detection - {show_edges.title()}', edge_maps[show_edges])
+                    # Edge maps are computed here, on the display side; the governor counts them
+                    # as frame cost so that turning them off is a saving it can see
+                    if self.governor is not None:
+                        self.governor.charge(sum(edge_maps.timings.values()))
+                clock.lap('show')
+                clock.finish()
             
-            # Handle key presses
-            key = cv2.waitKey(1) & 0xFF
+            # Handle key presses; the wait also paces the display rate
+            remaining = period - (time.perf_counter() - display_start)
+            key = cv2.waitKey(max(1, int(remaining * 1000))) & 0xFF
             if key == ord('q'):
                 break
-            elif key == ord('s'):
+            elif key == ord('s') and display_frame is not None:
                 timestamp = int(time.time())
                 filename = f'uowd_aerospace_screenshot_{timestamp}.jpg'
                 cv2.imwrite(filename, display_frame)
@@ -453,6 +918,12 @@ class AdvancedMachineVision:
             elif key == ord('d'):
                 filename = self.save_detection_data(detected_objects)
                 print(f"Detection data saved: {filename}")
+            elif key == ord('h'):
+                filename = self.save_count_history()
+                print(f"Count history saved: {filename}")
+            elif key == ord('p'):
+                filename = self.save_stage_timings()
+                print(f"Stage timings saved: {filename}")
             elif key == ord('1'):
                 show_edges = 'canny'
             elif key == ord('2'):
@@ -468,17 +939,79 @@ class AdvancedMachineVision:
                 cv2.destroyWindow('Edge Detection - Laplacian')
                 cv2.destroyWindow('Edge Detection - Combined')
         
+        self.running = False
+        self.capture.stop()
+        detection.join(timeout=2.0)
+        print(f"Processed {detection.produced} frames, {detection.latest.replaced} not displayed")
+        # The caller cleans up after an error, as after any other exception
+        if detection.error is not None:
+            raise detection.error
         self.cleanup()
     
+    def record_result(self, result):
+        """Count a finished frame towards FPS, stage timings and capture latency, and log it"""
+        self.stage_clock.finish()
+        self.calculate_fps()
+        self.capture.record_result(result[0])
+        
+        # Queued for the log writer thread; a full queue drops the frame instead of waiting
+        if self.detection_log is not None:
+            _, _, detected_objects, object_counts, _ = result
+            self.detection_log.write(self.frames_processed, round(time.time(), 3), detected_objects, object_counts)
+        self.frames_processed += 1
+    
     def cleanup(self):
         """Clean up resources"""
         self.running = False
-        if self.cap.isOpened():
+        if self.capture is not None:
+            self.capture.stop()
+            print(self.capture.summary())
+        if self.governor is not None:
+            print(self.governor.summary())
+        if self.motion_gating:
+            print(self.motion_gate.summary())
+        if self.attribute_caching:
+            print(self.attribute_cache.summary())
+        if self.segmentation_executor is not None:
+            self.segmentation_executor.shutdown()
+            self.segmentation_executor = None
+        if self.stage_clock.frames:
+            print(self.stage_clock.report("Processing stages"))
+        if self.display_clock.frames:
+            print(self.display_clock.report("Display stages"))
+        if self.detection_log is not None:
+            self.detection_log.stop()
+            print(self.detection_log.summary())
+            self.detection_log = None
+        if self.cap is not None:
             self.cap.release()
         cv2.destroyAllWindows()
         print("Machine Vision System shut down successfully")
 
 def main():
+    parser = argparse.ArgumentParser(description="Team-Aetherion advanced machine vision system")
+    add_source_arguments(parser)
+    parser.add_argument('--frame-budget', type=float, default=0,
+                        help="Milliseconds per frame; lower quality step by step while over it (0 = off)")
+    parser.add_argument('--motion-gate', action='store_true',
+                        help="Analyse only the tiles that changed since the last frame (static cameras)")
+    parser.add_argument('--track-cache', action='store_true',
+                        help="Reuse each tracked object's shape, color and hex until it changes")
+    parser.add_argument('--allocation-free', action='store_true',
+                        help="Pool per-blob statistics as well, at the cost of a second labelling pass")
+    args = parser.parse_args()
+    
+    # The source opens in the background while the banner prints
+    source = open_source(args.source, args.record, args.loop).open_async()
+    vision_system = AdvancedMachineVision(source=source)
+    vision_system.frame_budget_ms = args.frame_budget
+    vision_system.motion_gating = args.motion_gate
+    vision_system.attribute_caching = args.track_cache
+    vision_system.allocation_free = args.allocation_free
+    if not source.live:
+        # Recorded and generated frames are all processed, as fast as detection runs
+        vision_system.capture_drop_policy = 'block'
+    
     print("=" * 60)
     print("TEAM-AETHERION - UOWD AEROSPACE ADVANCED MACHINE VISION SYSTEM")
     print("=" * 60)
@@ -492,14 +1025,13 @@ def main():
     print(" Statistical Analysis (Area, Circularity, etc.)")
     print(" Data Export to JSON")
     print(" FPS Counter and Performance Metrics")
-    print("\nInitializing camera...")
-    
-    vision_system = AdvancedMachineVision()
+    print(f"\nInitializing {source.describe()}...")
     
-    # Check if camera is available
+    # Check if the source is available
     if not vision_system.cap.isOpened():
-        print("Error: Could not access camera!")
-        print("Please check if your camera is connected and not in use by another application.")
+        print(f"Error: Could not open {source.describe()}!")
+        if source.live:
+            print("Please check if your camera is connected and not in use by another application.")
         return
     
     try:
@@ -0,0 +1,238 @@
+import cv2
+import numpy as np
+import argparse
+import json
+import platform
+import sys
+import time
+
+from profiling import StageClock
+from scenes import synthetic_scene
+from tracking import match_detections
+
+RESOLUTIONS = {
+    'vga': (640, 480),
+    '720p': (1280, 720),
+    '1080p': (1920, 1080),
+    '4k': (3840, 2160)
+}
+
+def parse_resolution(value):
+    """'1080p' or '1920x1080' -> (width, height)"""
+    if value.lower() in RESOLUTIONS:
+        return RESOLUTIONS[value.lower()]
+    width, height = value.lower().split('x')
+    return int(width), int(height)
+
+def make_system(system_name, scale=1, refine=True, threads=1):
+    """Vision system, its per-frame function and the background its segmentation expects"""
+    if system_name == 'basic':
+        from machine_vision import MachineVisionSystem
+        
+        system = MachineVisionSystem()
+        return system, system.process_frame, 'dark'
+    if system_name == 'advanced':
+        from advanced_machine_vision import AdvancedMachineVision
+        
+        system = AdvancedMachineVision(open_camera=False)
+        system.segmentation_scale = scale
+        system.segmentation_refine = refine
+        system.segmentation_threads = threads
+        return system, system.process_frame_advanced, 'dotted'
+    raise ValueError(f"Unknown system: {system_name}")
+
+def agreement(detected_objects, reference, tolerance):
+    """Share of reference objects found again with the same color and shape, and their mean offset"""
+    if not reference:
+        return 1.0, 0.0
+    centers = [obj['center'] for obj in detected_objects]
+    matches = match_detections(centers, [obj['center'] for obj in reference], tolerance)
+    
+    offsets = []
+    for obj, index in zip(detected_objects, matches):
+        if index >= 0 and (obj['color'], obj['shape']) == (reference[index]['color'], reference[index]['shape']):
+            offsets.append(np.hypot(*np.subtract(obj['center'], reference[index]['center'])))
+    return len(offsets) / len(reference), float(np.mean(offsets)) if offsets else 0.0
+
+def run_case(system_name, width, height, objects, frames=5, warmup=1, seed=0, scale=1, refine=True, reference=None,
+             threads=1):
+    """benchmark_case result and the detections of its last frame"""
+    system, process, background = make_system(system_name, scale, refine, threads)
+    scene = synthetic_scene(width, height, objects, seed, background)
+    clock = StageClock()
+    system.stage_clock = clock
+    
+    totals = []
+    stages = {}
+    counters = {}
+    detected_objects = []
+    for i in range(warmup + frames):
+        frame = scene.copy()
+        start = time.perf_counter()
+        result = process(frame)
+        elapsed = (time.perf_counter() - start) * 1000
+        if i < warmup:
+            continue
+        
+        totals.append(elapsed)
+        detected_objects = result[1]
+        for stage, ms in clock.frame_ms().items():
+            stages.setdefault(stage, []).append(ms)
+        for name, value in clock.counters.items():
+            counters.setdefault(name, []).append(value)
+    
+    if getattr(system, 'cap', None) is not None:
+        system.cap.release()
+    if getattr(system, 'segmentation_executor', None) is not None:
+        system.segmentation_executor.shutdown()
+    
+    result = {
+        'system': system_name,
+        'width': width,
+        'height': height,
+        'objects': objects,
+        'scale': scale,
+        'refine': refine if scale > 1 else False,
+        'threads': threads,
+        'detected': len(detected_objects),
+        'frames': frames,
+        'total_ms': float(np.median(totals)),
+        # Stages a frame never entered count as zero
+        'stages': {stage: float(np.median(values + [0.0] * (frames - len(values))))
+                   for stage, values in stages.items()},
+        # Buffer allocations, intermediate-image cache hits and the time they saved, per frame
+        'counters': {name: float(np.median(values)) for name, values in counters.items()}
+    }
+    if reference is not None:
+        # Accuracy against full-resolution segmentation of the same scene
+        result['recall'], result['offset_px'] = agreement(detected_objects, reference, 2 * scale + 4)
+    return result, detected_objects
+
+def benchmark_case(system_name, width, height, objects, frames=5, warmup=1, seed=0, scale=1, refine=True, reference=None,
+                   threads=1):
+    """Median per-frame and per-stage milliseconds of one system on one scene"""
+    return run_case(system_name, width, height, objects, frames, warmup, seed, scale, refine, reference, threads)[0]
+
+def run_suite(systems, resolutions, object_counts, frames=5, scales=(1,), refine=True, progress=None, threads=(1,)):
+    """benchmark_case over every system, resolution, object count, segmentation scale and thread count"""
+    results = []
+    for system_name in systems:
+        # Only the advanced system has pyramid and tiled modes; recall is measured against 1/1 on one thread
+        if system_name == 'advanced':
+            configs = [(1, 1)] + [(scale, count) for scale in sorted(set(scales)) for count in sorted(set(threads))
+                                  if (scale, count) != (1, 1)]
+        else:
+            configs = [(1, 1)]
+        for width, height in resolutions:
+            for objects in object_counts:
+                reference = None
+                for scale, count in configs:
+                    result, detected_objects = run_case(system_name, width, height, objects, frames, scale=scale,
+                                                        refine=refine, reference=reference, threads=count)
+                    if reference is None:
+                        reference = detected_objects
+                        if system_name == 'advanced' and (1 not in scales or 1 not in threads):
+                            continue
+                    results.append(result)
+                    if progress is not None:
+                        progress(result)
+    return results
+
+def case_key(result):
+    return (result['system'], result['width'], result['height'], result['objects'],
+            result.get('scale', 1), result.get('refine', False), result.get('threads', 1))
+
+def compare_to_baseline(results, baseline, tolerance=0.25, min_ms=0.5):
+    """Stages slower than the baseline by more than tolerance (relative) and min_ms (absolute)"""
+    reference = {case_key(result): result for result in baseline}
+    regressions = []
+    
+    for result in results:
+        base = reference.get(case_key(result))
+        if base is None:
+            continue
+        timings = [('total', result['total_ms'], base['total_ms'])]
+        timings += [(stage, result['stages'].get(stage, 0.0), ms) for stage, ms in base['stages'].items()]
+        
+        for stage, current, previous in timings:
+            if current > previous * (1 + tolerance) and current - previous > min_ms:
+                system, width, height, objects, scale, _, threads = case_key(result)
+                regressions.append(f"{system} {width}x{height} {objects} objects 1/{scale} x{threads}: {stage} "
+                                   f"{previous:.2f} -> {current:.2f} ms")
+    return regressions
+
+def print_result(result):
+    stages = "  ".join(f"{stage} {ms:.2f}" for stage, ms in sorted(result['stages'].items(), key=lambda item: -item[1]))
+    scale = f"1/{result['scale']}{'+' if result['refine'] else ''} x{result.get('threads', 1)}"
+    accuracy = f" recall {result['recall']:.0%} ~{result['offset_px']:.1f}px" if 'recall' in result else ""
+    counters = result.get('counters', {})
+    reuse = (f" | {counters.get('allocations', 0):.0f} alloc, {counters.get('saved ms', 0):.2f} ms reused"
+             if counters else "")
+    print(f"  {result['system']:>8} {result['width']:>4}x{result['height']:<4} {result['objects']:>3} objects "
+          f"{scale:>7} ({result['detected']:>3} found{accuracy}): {result['total_ms']:8.2f} ms | {stages}{reuse}")
+
+def print_scaling(results):
+    """Speedup of each tiled case over the same case on one thread"""
+    single = {case_key(result)[:6]: result['total_ms'] for result in results if result.get('threads', 1) == 1}
+    lines = []
+    for result in results:
+        base = single.get(case_key(result)[:6])
+        if result.get('threads', 1) > 1 and base:
+            lines.append(f"  {result['width']}x{result['height']} {result['objects']} objects 1/{result['scale']}: "
+                         f"{result['threads']} threads {base / result['total_ms']:.2f}x "
+                         f"(segmentation {sum(result['stages'].get(stage, 0.0) for stage in ('threshold', 'contours')):.2f} ms)")
+    if lines:
+        print("\nTiled segmentation scaling against one thread:")
+        print("\n".join(lines))
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-stage benchmark of both vision systems on synthetic scenes")
+    parser.add_argument('--systems', nargs='+', default=['basic', 'advanced'], choices=['basic', 'advanced'])
+    parser.add_argument('--resolutions', nargs='+', default=['vga', '1080p', '4k'],
+                        help="Names (vga, 720p, 1080p, 4k) or WIDTHxHEIGHT")
+    parser.add_argument('--objects', type=int, nargs='+', default=[1, 10, 100, 500])
+    parser.add_argument('--frames', type=int, default=5, help="Timed frames per case")
+    parser.add_argument('--scales', type=int, nargs='+', default=[1],
+                        help="Segmentation downscale factors of the advanced system (recall is measured against 1)")
+    parser.add_argument('--threads', type=int, nargs='+', default=[1],
+                        help="Tiled segmentation thread counts of the advanced system (e.g. --threads 1 2 4 8 --resolutions 4k)")
+    parser.add_argument('--no-refine', action='store_true', help="Keep downscaled contours without full-resolution refinement")
+    parser.add_argument('--output', default='benchmark_results.json', help="Where to write the results")
+    parser.add_argument('--baseline', help="Fail if a stage is slower than in this results file")
+    parser.add_argument('--save-baseline', help="Also write the results here as the new baseline")
+    parser.add_argument('--tolerance', type=float, default=0.25, help="Allowed relative slowdown per stage")
+    args = parser.parse_args()
+    
+    resolutions = [parse_resolution(value) for value in args.resolutions]
+    print(f"\nBenchmarking {len(args.systems)} system(s) at {len(resolutions)} resolution(s) and "
+          f"{len(args.objects)} object count(s) ({args.frames} frames each):")
+    results = run_suite(args.systems, resolutions, args.objects, args.frames, args.scales, 
+                        not args.no_refine, progress=print_result, threads=args.threads)
+    print_scaling(results)
+    
+    report = {
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'opencv': cv2.__version__,
+        'numpy': np.__version__,
+        'machine': platform.machine(),
+        'results': results
+    }
+    for path in filter(None, (args.output, args.save_baseline)):
+        with open(path, 'w') as f:
+            json.dump(report, f, indent=2)
+    print(f"\nResults written to {args.output}")
+    
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)['results']
+        regressions = compare_to_baseline(results, baseline, args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} stage(s) regressed past the baseline:")
+            for regression in regressions:
+                print(f"  {regression}")
+            sys.exit(1)
+        print("No regressions against the baseline")
+
+if __name__ == "__main__":
+    main()
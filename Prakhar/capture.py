@@ -0,0 +1,107 @@
+import numpy as np
+import threading
+from collections import deque
+import time
+
+class ThreadedCapture:
+    """Reads frames on a background thread into a small bounded buffer"""
+    drop_policies = ('drop_oldest', 'drop_newest', 'block')
+    
+    def __init__(self, cap, buffer_size=2, drop_policy='drop_oldest', latency_window=1000):
+        if drop_policy not in self.drop_policies:
+            raise ValueError(f"Unknown drop policy: {drop_policy}")
+        self.cap = cap
+        self.buffer_size = buffer_size
+        self.drop_policy = drop_policy
+        
+        self.buffer = deque()
+        self.condition = threading.Condition()
+        self.thread = None
+        self.running = False
+        self.finished = False
+        
+        # Statistics
+        self.captured = 0
+        self.dropped = 0
+        self.latencies = deque(maxlen=latency_window)
+    
+    def start(self):
+        """Start the capture thread"""
+        self.running = True
+        self.finished = False
+        self.thread = threading.Thread(target=self._capture_loop, name="capture", daemon=True)
+        self.thread.start()
+        return self
+    
+    def _capture_loop(self):
+        """Grab frames and stamp them with the capture time"""
+        while self.running:
+            ret, frame = self.cap.read()
+            stamp = time.perf_counter()
+            
+            with self.condition:
+                if not ret:
+                    break
+                self.captured += 1
+                
+                if len(self.buffer) >= self.buffer_size:
+                    if self.drop_policy == 'drop_oldest':
+                        self.buffer.popleft()
+                        self.dropped += 1
+                    elif self.drop_policy == 'drop_newest':
+                        self.dropped += 1
+                        continue
+                    else:
+                        while self.running and len(self.buffer) >= self.buffer_size:
+                            self.condition.wait(0.1)
+                        if not self.running:
+                            break
+                
+                self.buffer.append((frame, stamp))
+                self.condition.notify_all()
+        
+        with self.condition:
+            self.finished = True
+            self.condition.notify_all()
+    
+    def read(self, timeout=None):
+        """Return (ret, frame, capture_time) for the oldest buffered frame"""
+        with self.condition:
+            deadline = None if timeout is None else time.perf_counter() + timeout
+            while not self.buffer and not self.finished:
+                remaining = None if deadline is None else deadline - time.perf_counter()
+                if remaining is not None and remaining <= 0:
+                    return False, None, None
+                self.condition.wait(remaining)
+            
+            if not self.buffer:
+                return False, None, None
+            frame, stamp = self.buffer.popleft()
+            self.condition.notify_all()
+            return True, frame, stamp
+    
+    def record_result(self, capture_time):
+        """Record capture-to-result latency of a processed frame"""
+        self.latencies.append((time.perf_counter() - capture_time) * 1000)
+    
+    def latency_percentiles(self, percentiles=(50, 95, 99)):
+        """Capture-to-result latency percentiles in milliseconds"""
+        if not self.latencies:
+            return {p: 0.0 for p in percentiles}
+        values = np.percentile(np.fromiter(self.latencies, dtype=np.float64), percentiles)
+        return dict(zip(percentiles, values))
+    
+    def summary(self):
+        """One-line latency and drop report"""
+        p = self.latency_percentiles()
+        return (f"Latency p50/p95/p99: {p[50]:.1f}/{p[95]:.1f}/{p[99]:.1f} ms, "
+                f"captured: {self.captured}, dropped: {self.dropped}")
+    
+    def stop(self):
+        """Stop the capture thread"""
+        self.running = False
+        with self.condition:
+            self.condition.notify_all()
+        if self.thread is not None:
+            self.thread.join(timeout=2.0)
+            self.thread = None
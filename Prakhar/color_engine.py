@@ -0,0 +1,157 @@
+import cv2
+import numpy as np
+import threading
+
+class ContourMask:
+    """Bounding-box-local contour mask drawn into a reused scratch buffer"""
+    def __init__(self):
+        # One scratch buffer per thread so worker threads never share a mask
+        self._local = threading.local()
+    
+    def get(self, contour):
+        """Return the contour's bounding box and its filled ROI mask"""
+        x, y, w, h = cv2.boundingRect(contour)
+        buffer = getattr(self._local, 'buffer', None)
+        if buffer is None or buffer.size < w * h:
+            buffer = np.empty(max(w * h, 4096), dtype=np.uint8)
+            self._local.buffer = buffer
+        
+        mask = buffer[:w * h].reshape(h, w)
+        mask.fill(0)
+        cv2.fillPoly(mask, [contour], 255, offset=(-x, -y))
+        return (x, y, w, h), mask
+
+def masked_median(roi, mask):
+    """Per-channel median of the masked ROI pixels from 256-bin histograms"""
+    channels = roi.shape[2] if roi.ndim == 3 else 1
+    median = np.zeros(channels, dtype=np.float64)
+    count = 0
+    
+    for c in range(channels):
+        hist = cv2.calcHist([roi], [c], mask, [256], [0, 256]).reshape(-1)
+        cumulative = np.cumsum(hist)
+        count = int(cumulative[-1])
+        if count == 0:
+            return median, 0
+        
+        # Same definition as np.median: average the two middle values
+        low = np.searchsorted(cumulative, (count - 1) // 2, side='right')
+        high = np.searchsorted(cumulative, count // 2, side='right')
+        median[c] = (low + high) / 2.0
+    
+    return median, count
+
+class ColorEngine:
+    """Compiled HSV color classifier shared by the vision systems"""
+    def __init__(self, color_ranges, union=False):
+        self.color_ranges = color_ranges
+        self.color_names = list(color_ranges.keys())
+        # union=True counts a pixel once per color even if several of its ranges match
+        self.union = union
+        self.contour_mask = ContourMask()
+        # Per-thread intermediate images of classify, reused while the frame size is unchanged
+        self._local = threading.local()
+        self._compile()
+    
+    @staticmethod
+    def normalize_ranges(ranges):
+        """Return ranges as a list of (lower, upper) pairs"""
+        # Accept both [(lo, hi), (lo, hi)] and the flat (lo, hi, lo, hi) layout
+        if len(ranges) and len(ranges[0]) == 2:
+            return [(tuple(lower), tuple(upper)) for lower, upper in ranges]
+        return [(tuple(ranges[i]), tuple(ranges[i + 1])) for i in range(0, len(ranges), 2)]
+    
+    def _compile(self):
+        """Compile color ranges into per-channel lookup tables"""
+        ranges = []
+        for color_index, name in enumerate(self.color_names):
+            for lower, upper in self.normalize_ranges(self.color_ranges[name]):
+                ranges.append((color_index, lower, upper))
+        
+        values = np.arange(256)
+        channel_luts = []
+        channel_hits = []
+        sizes = []
+        
+        # Split each channel into intervals on which every range is either fully in or out
+        for channel in range(3):
+            breaks = set()
+            for _, lower, upper in ranges:
+                breaks.add(int(lower[channel]))
+                breaks.add(int(upper[channel]) + 1)
+            breaks = np.array(sorted(b for b in breaks if 0 < b < 256), dtype=np.int64)
+            interval_of = np.searchsorted(breaks, values, side='right')
+            starts = np.concatenate(([0], breaks))
+            
+            hits = np.zeros((len(ranges), len(starts)), dtype=bool)
+            for r, (_, lower, upper) in enumerate(ranges):
+                hits[r] = (starts >= lower[channel]) & (starts <= upper[channel])
+            
+            channel_luts.append(interval_of)
+            channel_hits.append(hits)
+            sizes.append(len(starts))
+        
+        n_cells = sizes[0] * sizes[1] * sizes[2]
+        if n_cells > np.iinfo(np.uint16).max:
+            raise ValueError("Color ranges are too fragmented to compile")
+        
+        # Cell id = h_interval * (ns * nv) + s_interval * nv + v_interval
+        strides = (sizes[1] * sizes[2], sizes[2], 1)
+        lut = np.zeros((1, 256, 3), dtype=np.uint16)
+        for channel in range(3):
+            lut[0, :, channel] = channel_luts[channel] * strides[channel]
+        self._cell_lut = lut
+        self._channel_sum = np.ones((1, 3), dtype=np.float32)
+        
+        # Membership of every cell in every color (number of matching ranges)
+        inside = (channel_hits[0][:, :, None, None] &
+                  channel_hits[1][:, None, :, None] &
+                  channel_hits[2][:, None, None, :]).reshape(len(ranges), n_cells)
+        membership = np.zeros((n_cells, len(self.color_names)), dtype=np.int64)
+        for r, (color_index, _, _) in enumerate(ranges):
+            membership[:, color_index] += inside[r]
+        if self.union:
+            membership = np.minimum(membership, 1)
+        
+        # Cells with identical membership share one label
+        weights, cell_labels = np.unique(membership, axis=0, return_inverse=True)
+        if len(weights) > 256:
+            raise ValueError("Color ranges produce more than 256 distinct labels")
+        
+        self._cell_to_label = cell_labels.reshape(-1).astype(np.uint8)
+        self.label_weights = weights.astype(np.float32)
+        self.n_labels = len(weights)
+    
+    def _scratch(self, name, shape, dtype):
+        buffers = getattr(self._local, 'buffers', None)
+        if buffers is None:
+            buffers = self._local.buffers = {}
+        buffer = buffers.get(name)
+        if buffer is None or buffer.shape != shape:
+            buffer = buffers[name] = np.empty(shape, dtype=dtype)
+        return buffer
+    
+    def classify(self, hsv_frame, dst=None):
+        """Classify an HSV image into a uint8 label map in one pass"""
+        shape = hsv_frame.shape[:2]
+        cells = cv2.LUT(hsv_frame, self._cell_lut, dst=self._scratch('channels', shape + (3,), np.uint16))
+        cells = cv2.transform(cells, self._channel_sum, dst=self._scratch('cells', shape, np.uint16))
+        if dst is None:
+            dst = np.empty(cells.shape, dtype=np.uint8)
+        # np.take converts other index types to intp and buffers `out` unless mode='clip'; every
+        # cell id is in range, so both temporaries are avoided
+        index = self._scratch('index', shape, np.intp)
+        np.copyto(index, cells)
+        np.take(self._cell_to_label, index, out=dst, mode='clip')
+        return dst
+    
+    def contour_counts(self, contour, label_map=None, hsv_frame=None):
+        """Count pixels of each color inside a contour"""
+        (x, y, w, h), mask = self.contour_mask.get(contour)
+        if label_map is not None:
+            roi_labels = label_map[y:y + h, x:x + w]
+        else:
+            roi_labels = self.classify(hsv_frame[y:y + h, x:x + w])
+        
+        hist = cv2.calcHist([roi_labels], [0], mask, [self.n_labels], [0, self.n_labels])
+        return hist.reshape(-1) @ self.label_weights
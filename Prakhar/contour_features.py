@@ -0,0 +1,87 @@
+import cv2
+import numpy as np
+
+# One row per contour; every geometric feature is computed exactly once
+FEATURE_DTYPE = np.dtype([
+    ('area', np.float64),
+    ('perimeter', np.float64),
+    ('x', np.int32),
+    ('y', np.int32),
+    ('w', np.int32),
+    ('h', np.int32),
+    ('vertices', np.int32),
+    ('hull_area', np.float64),
+    ('solidity', np.float64),
+    ('extent', np.float64),
+    ('aspect_ratio', np.float64),
+    ('circularity', np.float64)
+])
+
+SHAPE_NAMES = np.array(['Unknown', 'Triangle', 'Square', 'Rectangle', 'Pentagon', 'Hexagon',
+                        'Circle', 'Oval', 'Star', 'Complex', 'Irregular'])
+
+def extract_features(contours, areas=None, epsilon_factor=0.02):
+    """Compute the geometric features of every contour into a structured array"""
+    features = np.zeros(len(contours), dtype=FEATURE_DTYPE)
+    if len(contours) == 0:
+        return features
+    
+    if areas is None:
+        areas = [cv2.contourArea(contour) for contour in contours]
+    
+    # The OpenCV calls are per contour; everything derived from them is vectorized
+    perimeters = np.empty(len(contours))
+    vertices = np.empty(len(contours), dtype=np.int32)
+    hull_areas = np.empty(len(contours))
+    boxes = np.empty((len(contours), 4), dtype=np.int32)
+    
+    for i, contour in enumerate(contours):
+        perimeter = cv2.arcLength(contour, True)
+        perimeters[i] = perimeter
+        vertices[i] = len(cv2.approxPolyDP(contour, epsilon_factor * perimeter, True))
+        hull_areas[i] = cv2.contourArea(cv2.convexHull(contour))
+        boxes[i] = cv2.boundingRect(contour)
+    
+    area = np.asarray(areas, dtype=np.float64)
+    w = boxes[:, 2]
+    h = boxes[:, 3]
+    box_area = (w * h).astype(np.float64)
+    
+    features['area'] = area
+    features['perimeter'] = perimeters
+    features['x'] = boxes[:, 0]
+    features['y'] = boxes[:, 1]
+    features['w'] = w
+    features['h'] = h
+    features['vertices'] = vertices
+    features['hull_area'] = hull_areas
+    
+    with np.errstate(divide='ignore', invalid='ignore'):
+        features['solidity'] = np.where(hull_areas > 0, area / hull_areas, 0)
+        features['aspect_ratio'] = np.where(h > 0, w / h, 0)
+        features['extent'] = np.where(box_area > 0, area / box_area, 0)
+        features['circularity'] = np.where(perimeters > 0, 4 * np.pi * area / (perimeters * perimeters), 0)
+    
+    return features
+
+def classify_shapes(features):
+    """Vectorized shape rules over a feature array; returns shape names"""
+    vertices = features['vertices']
+    aspect_ratio = features['aspect_ratio']
+    circularity = features['circularity']
+    
+    # Conditions are checked in order, like the if/elif chain they replace
+    conditions = [
+        features['perimeter'] == 0,
+        vertices == 3,
+        (vertices == 4) & (aspect_ratio >= 0.95) & (aspect_ratio <= 1.05),
+        vertices == 4,
+        vertices == 5,
+        vertices == 6,
+        circularity > 0.7,
+        circularity > 0.5,
+        (vertices > 6) & (features['solidity'] > 0.9),
+        vertices > 6
+    ]
+    shape_index = np.select(conditions, np.arange(len(conditions)), default=len(conditions))
+    return SHAPE_NAMES[shape_index]
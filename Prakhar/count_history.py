@@ -0,0 +1,180 @@
+import numpy as np
+import threading
+import time
+
+class CountHistory:
+    """Fixed-size ring buffer of per-frame object counts per "color shape" class"""
+    total_name = 'Total'
+    
+    def __init__(self, capacity=1000, windows=(30, 300)):
+        if any(window > capacity for window in windows):
+            raise ValueError("Rolling windows cannot be longer than the history")
+        self.capacity = capacity
+        self.windows = tuple(windows)
+        self.lock = threading.Lock()
+        
+        # Column 0 holds the total; classes get columns in first-seen order
+        self.names = [self.total_name]
+        self.columns = {self.total_name: 0}
+        self.counts = np.zeros((capacity, 8), dtype=np.int32)
+        self.times = np.zeros(capacity)
+        self.frames = 0
+        
+        # Rolling state per window: running sum, plus van Herk/Gil-Werman blocks for min/max
+        self.rolling_state = {window: self._new_state(window) for window in self.windows}
+    
+    def _new_state(self, window):
+        width = self.counts.shape[1]
+        return {
+            'sum': np.zeros(width, dtype=np.int64),
+            'prefix_min': np.zeros(width, dtype=np.int32),
+            'prefix_max': np.zeros(width, dtype=np.int32),
+            # Suffix min/max of the last complete block of `window` frames
+            'suffix_min': np.zeros((window, width), dtype=np.int32),
+            'suffix_max': np.zeros((window, width), dtype=np.int32)
+        }
+    
+    def _grow(self):
+        """Double the number of class columns; earlier frames count zero for new classes"""
+        width = self.counts.shape[1]
+        self.counts = np.pad(self.counts, ((0, 0), (0, width)))
+        for state in self.rolling_state.values():
+            for key, value in state.items():
+                pad = ((0, width),) if value.ndim == 1 else ((0, 0), (0, width))
+                state[key] = np.pad(value, pad)
+    
+    def append(self, object_counts, timestamp=None):
+        """Add one frame's counts; rolling statistics are updated in O(1) per class"""
+        with self.lock:
+            for name in object_counts:
+                if name not in self.columns:
+                    if len(self.names) == self.counts.shape[1]:
+                        self._grow()
+                    self.columns[name] = len(self.names)
+                    self.names.append(name)
+            
+            row = np.zeros(self.counts.shape[1], dtype=np.int32)
+            for name, count in object_counts.items():
+                row[self.columns[name]] = count
+            row[0] = row[1:].sum()
+            
+            frame = self.frames
+            index = frame % self.capacity
+            for window, state in self.rolling_state.items():
+                # The frame leaving the window is read before its slot can be overwritten
+                state['sum'] += row
+                if frame >= window:
+                    state['sum'] -= self.counts[(frame - window) % self.capacity]
+                
+                if frame % window == 0:
+                    state['prefix_min'][:] = row
+                    state['prefix_max'][:] = row
+                else:
+                    np.minimum(state['prefix_min'], row, out=state['prefix_min'])
+                    np.maximum(state['prefix_max'], row, out=state['prefix_max'])
+            
+            self.counts[index] = row
+            self.times[index] = time.time() if timestamp is None else timestamp
+            self.frames += 1
+            
+            for window, state in self.rolling_state.items():
+                if frame % window == window - 1:
+                    block = self.counts[np.arange(frame - window + 1, frame + 1) % self.capacity]
+                    state['suffix_min'][:] = np.minimum.accumulate(block[::-1])[::-1]
+                    state['suffix_max'][:] = np.maximum.accumulate(block[::-1])[::-1]
+    
+    def __len__(self):
+        return min(self.frames, self.capacity)
+    
+    def latest(self):
+        """Counts of the newest frame, classes in first-seen order, zeros left out"""
+        with self.lock:
+            if self.frames == 0:
+                return {}
+            row = self.counts[(self.frames - 1) % self.capacity]
+            return {name: int(row[column]) for name, column in self.columns.items()
+                    if column > 0 and row[column] > 0}
+    
+    def rolling(self, window):
+        """Mean, min and max per class (and total) over the last `window` frames"""
+        with self.lock:
+            state = self.rolling_state[window]
+            last = self.frames - 1
+            position = last % window
+            
+            if last < 0:
+                width = self.counts.shape[1]
+                mean, low, high = np.zeros(width), np.zeros(width), np.zeros(width)
+            else:
+                mean = state['sum'] / min(self.frames, window)
+                low = state['prefix_min'].copy()
+                high = state['prefix_max'].copy()
+                # A window that does not start on a block boundary also covers the previous block's tail
+                if last >= window and position != window - 1:
+                    np.minimum(low, state['suffix_min'][position + 1], out=low)
+                    np.maximum(high, state['suffix_max'][position + 1], out=high)
+            
+            return {
+                stat: {name: values[column].item() for name, column in self.columns.items()}
+                for stat, values in (('mean', mean), ('min', low), ('max', high))
+            }
+    
+    def _segments(self):
+        """Ring slices in time order"""
+        head = self.frames % self.capacity
+        if self.frames <= self.capacity:
+            return [slice(0, head if self.frames < self.capacity else self.capacity)]
+        return [slice(head, self.capacity), slice(0, head)]
+    
+    def range(self, start_time=None, end_time=None):
+        """Times and per-class counts of the stored frames with start_time <= time <= end_time"""
+        with self.lock:
+            times = []
+            rows = []
+            # Each ring segment is sorted by time, so the bounds are binary searches
+            for segment in self._segments():
+                segment_times = self.times[segment]
+                lo = 0 if start_time is None else np.searchsorted(segment_times, start_time, side='left')
+                hi = len(segment_times) if end_time is None else np.searchsorted(segment_times, end_time, side='right')
+                times.append(segment_times[lo:hi])
+                rows.append(self.counts[segment][lo:hi])
+            
+            times = np.concatenate(times)
+            rows = np.concatenate(rows)
+            return times, {name: rows[:, column].copy() for name, column in self.columns.items()}
+    
+    def to_dict(self, start_time=None, end_time=None):
+        """JSON-ready time series of the stored frames"""
+        times, counts = self.range(start_time, end_time)
+        return {'time': times.tolist(), 'counts': {name: values.tolist() for name, values in counts.items()}}
+
+def benchmark_history(frames=100000, classes=40, window=300):
+    """Microseconds per append and per rolling query"""
+    rng = np.random.default_rng(0)
+    names = [f"Class {i}" for i in range(classes)]
+    history = CountHistory(capacity=1000, windows=(window,))
+    samples = [dict(zip(names, rng.integers(0, 4, classes).tolist())) for _ in range(1000)]
+    
+    start = time.perf_counter()
+    for i in range(frames):
+        history.append(samples[i % len(samples)], timestamp=float(i))
+    append_us = (time.perf_counter() - start) * 1e6 / frames
+    
+    start = time.perf_counter()
+    for _ in range(1000):
+        history.rolling(window)
+    rolling_us = (time.perf_counter() - start) * 1e3
+    
+    start = time.perf_counter()
+    for i in range(1000):
+        history.range(frames - 500.0, frames - 200.0)
+    range_us = (time.perf_counter() - start) * 1e3
+    return append_us, rolling_us, range_us
+
+def main():
+    append_us, rolling_us, range_us = benchmark_history()
+    print(f"\nCount history (40 classes, 300-frame window): append {append_us:.1f} us, "
+          f"rolling mean/min/max {rolling_us:.1f} us, range query {range_us:.1f} us")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+import numpy as np
+import sys
+
+class Detection:
+    """Compact detection record with dict-style field access"""
+    __slots__ = ('shape', 'color', 'hex', 'area', 'perimeter', 'circularity', 'center', 'bbox',
+                 'median_color', 'id', 'age', '_contour')
+    fields = ('shape', 'color', 'hex', 'area', 'perimeter', 'circularity', 'center', 'bbox',
+              'median_color', 'id', 'age', 'contour')
+    contour_modes = ('compressed', 'full', 'none')
+    
+    def __init__(self, shape, color, hex, area, center, bbox, perimeter=None, circularity=None,
+                 median_color=None, contour=None, contour_mode='compressed'):
+        self.shape = shape
+        self.color = color
+        self.hex = hex
+        self.area = area
+        self.perimeter = perimeter
+        self.circularity = circularity
+        self.center = center
+        self.bbox = bbox
+        self.median_color = None if median_color is None else tuple(float(c) for c in median_color)
+        self.id = None
+        self.age = None
+        self._contour = None
+        if contour is not None:
+            self.set_contour(contour, contour_mode)
+    
+    def set_contour(self, contour, contour_mode='compressed'):
+        """Store the contour in full, as packed int16 points, or not at all"""
+        if contour_mode not in self.contour_modes:
+            raise ValueError(f"Unknown contour mode: {contour_mode}")
+        if contour_mode == 'none':
+            self._contour = None
+        elif contour_mode == 'full' or np.abs(contour).max() > np.iinfo(np.int16).max:
+            self._contour = contour
+        else:
+            self._contour = np.ascontiguousarray(contour.reshape(-1, 2), dtype=np.int16)
+    
+    @property
+    def contour(self):
+        """Contour in OpenCV (N, 1, 2) int32 layout, or None if it was not kept"""
+        if self._contour is None or self._contour.ndim == 3:
+            return self._contour
+        return self._contour.reshape(-1, 1, 2).astype(np.int32)
+    
+    def copy(self):
+        """Shallow copy; the contour array is shared"""
+        copied = Detection.__new__(Detection)
+        for name in self.__slots__:
+            setattr(copied, name, getattr(self, name))
+        return copied
+    
+    def translated(self, dx, dy):
+        """Copy of the detection moved by (dx, dy) pixels"""
+        moved = self.copy()
+        
+        moved.center = (self.center[0] + dx, self.center[1] + dy)
+        x, y, w, h = self.bbox
+        moved.bbox = (x + dx, y + dy, w, h)
+        if self._contour is not None:
+            moved._contour = self._contour + np.array([dx, dy], dtype=self._contour.dtype)
+        return moved
+    
+    def __getitem__(self, name):
+        if name not in self.fields:
+            raise KeyError(name)
+        value = getattr(self, name)
+        if value is None:
+            raise KeyError(name)
+        return value
+    
+    def __setitem__(self, name, value):
+        if name == 'contour':
+            self.set_contour(value)
+        elif name in self.fields:
+            setattr(self, name, value)
+        else:
+            raise KeyError(name)
+    
+    def __contains__(self, name):
+        return name in self.fields and getattr(self, name) is not None
+    
+    def get(self, name, default=None):
+        return self[name] if name in self else default
+    
+    def keys(self):
+        return [name for name in self.fields if name in self]
+    
+    def to_dict(self):
+        """Plain dict with the same keys the detection dicts used to have"""
+        return {name: self[name] for name in self.keys()}
+    
+    def __repr__(self):
+        label = f"ID-{self.id} " if self.id is not None else ""
+        return f"Detection({label}{self.color} {self.shape}, center={self.center}, area={self.area})"
+
+def deep_sizeof(obj, seen=None):
+    """Approximate memory held by an object, including NumPy buffers"""
+    if seen is None:
+        seen = set()
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    
+    size = sys.getsizeof(obj)
+    if isinstance(obj, np.ndarray):
+        # getsizeof covers the buffer only for arrays that own their data
+        return size if obj.base is None else size + obj.nbytes
+    if isinstance(obj, dict):
+        size += sum(deep_sizeof(k, seen) + deep_sizeof(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set)):
+        size += sum(deep_sizeof(item, seen) for item in obj)
+    elif hasattr(obj, '__slots__'):
+        size += sum(deep_sizeof(getattr(obj, name), seen) for name in obj.__slots__ if hasattr(obj, name))
+    return size
+
+def main():
+    from advanced_machine_vision import AdvancedMachineVision
+    from scenes import synthetic_frames
+    
+    frames = list(synthetic_frames(10, 1280, 720))
+    print("\nMemory per tracked object (bytes):")
+    
+    for mode in Detection.contour_modes:
+        vision_system = AdvancedMachineVision(open_camera=False)
+        vision_system.contour_mode = mode
+        for frame in frames:
+            vision_system.process_frame_advanced(frame.copy())
+        
+        tracked = list(vision_system.tracking_objects.values())
+        slotted = sum(deep_sizeof(obj) for obj in tracked) / len(tracked)
+        if mode == 'compressed':
+            # The dict layout used before: full int32 contour plus a float64 median array
+            as_dicts = []
+            for obj in tracked:
+                record = obj.to_dict()
+                record['median_color'] = np.array(record['median_color'])
+                as_dicts.append(record)
+            legacy = sum(deep_sizeof(record) for record in as_dicts) / len(as_dicts)
+            print(f"  dict with raw contour:        {legacy:8.0f}")
+        print(f"  Detection, contour {mode:>10}: {slotted:8.0f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,252 @@
+import numpy as np
+import threading
+from collections import deque
+import json
+import os
+import struct
+import time
+
+BINARY_MAGIC = b'AETHLOG1'
+
+# Per-object columns of the binary format; strings are stored as codes into a per-block table
+OBJECT_COLUMNS = (
+    ('frame_index', np.uint32),
+    ('id', np.int64),
+    ('age', np.int32),
+    ('shape', np.uint8),
+    ('color', np.uint8),
+    ('rgb', np.uint32),
+    ('area', np.float32),
+    ('center_x', np.int32),
+    ('center_y', np.int32),
+    ('bbox_x', np.int32),
+    ('bbox_y', np.int32),
+    ('bbox_w', np.int32),
+    ('bbox_h', np.int32),
+    ('circularity', np.float32)
+)
+
+def object_fields(obj):
+    """One object's values for the binary columns after frame_index, shape and color as names"""
+    return ((obj['id'] if 'id' in obj else -1, obj['age'] if 'age' in obj else 0, obj['shape'], obj['color'],
+             int(obj['hex'][1:], 16), obj['area']) + tuple(obj['center']) + tuple(obj['bbox'])
+            + (obj['circularity'] if 'circularity' in obj else np.nan,))
+
+def encode_binary_block(entries):
+    """One columnar block for a batch of (frame, timestamp, rows, counts) entries, with the
+    object_fields() rows of each frame's objects"""
+    frames = np.array([entry[0] for entry in entries], dtype=np.int64)
+    times = np.array([entry[1] for entry in entries], dtype=np.float64)
+    rows = [row for entry in entries for row in entry[2]]
+    
+    shapes = {}
+    colors = {}
+    columns = {name: np.empty(len(rows), dtype=dtype) for name, dtype in OBJECT_COLUMNS}
+    columns['frame_index'][:] = np.repeat(np.arange(len(entries)), [len(entry[2]) for entry in entries])
+    
+    for (name, _), values in zip(OBJECT_COLUMNS[1:], zip(*rows)):
+        if name == 'shape':
+            values = [shapes.setdefault(value, len(shapes)) for value in values]
+        elif name == 'color':
+            values = [colors.setdefault(value, len(colors)) for value in values]
+        columns[name][:] = values
+    
+    arrays = [('frame', frames), ('time', times)] + [(name, columns[name]) for name, _ in OBJECT_COLUMNS]
+    header = json.dumps({
+        'frames': len(entries),
+        'objects': len(rows),
+        'columns': [[name, array.dtype.str] for name, array in arrays],
+        'shapes': list(shapes),
+        'colors': list(colors)
+    }).encode()
+    return b''.join([struct.pack('<I', len(header)), header] + [array.tobytes() for _, array in arrays])
+
+def read_binary_log(path):
+    """Load a binary detection log into frame and object column arrays"""
+    frame_parts = {'frame': [], 'time': []}
+    object_parts = {name: [] for name, _ in OBJECT_COLUMNS}
+    object_parts['shape_name'] = []
+    object_parts['color_name'] = []
+    frames_before = 0
+    
+    with open(path, 'rb') as f:
+        if f.read(len(BINARY_MAGIC)) != BINARY_MAGIC:
+            raise ValueError(f"Not a binary detection log: {path}")
+        while True:
+            size = f.read(4)
+            if len(size) < 4:
+                break
+            header = json.loads(f.read(struct.unpack('<I', size)[0]))
+            
+            for name, dtype in header['columns']:
+                dtype = np.dtype(dtype)
+                rows = header['frames'] if name in frame_parts else header['objects']
+                array = np.frombuffer(f.read(rows * dtype.itemsize), dtype=dtype)
+                if name in frame_parts:
+                    frame_parts[name].append(array)
+                else:
+                    object_parts[name].append(array)
+            
+            # Make frame_index global and resolve the per-block string tables
+            object_parts['frame_index'][-1] = object_parts['frame_index'][-1] + frames_before
+            object_parts['shape_name'].append(np.array(header['shapes'] or [''])[object_parts['shape'][-1]])
+            object_parts['color_name'].append(np.array(header['colors'] or [''])[object_parts['color'][-1]])
+            frames_before += header['frames']
+    
+    frames = {name: np.concatenate(parts) if parts else np.empty(0) for name, parts in frame_parts.items()}
+    objects = {name: np.concatenate(parts) if parts else np.empty(0) for name, parts in object_parts.items()}
+    del objects['shape'], objects['color']
+    return frames, objects
+
+class DetectionLogWriter:
+    """Append-only per-frame detection log written on a background thread"""
+    formats = {'ndjson': '.ndjson', 'binary': '.dlog'}
+    
+    def __init__(self, prefix, log_format='ndjson', serialize=None, queue_size=256, batch_size=64,
+                 flush_interval=1.0, max_bytes=64 * 1024 * 1024, max_seconds=3600):
+        if log_format not in self.formats:
+            raise ValueError(f"Unknown log format: {log_format}")
+        if log_format == 'ndjson' and serialize is None:
+            raise ValueError("NDJSON logs need a serialize function")
+        self.prefix = prefix
+        self.log_format = log_format
+        # serialize(objects, timestamp) -> list of dicts, used for NDJSON records when a frame is queued
+        self.serialize = serialize
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self.max_seconds = max_seconds
+        
+        self.queue = deque()
+        self.condition = threading.Condition()
+        self.thread = None
+        self.running = False
+        
+        self.file = None
+        self.file_bytes = 0
+        self.file_opened = 0.0
+        self.files = []
+        
+        # Frames a flush() call is waiting to see written
+        self.flushing = 0
+        
+        # Statistics
+        self.queued = 0
+        self.written = 0
+        self.dropped = 0
+        self.error = None
+    
+    def start(self):
+        """Start the writer thread"""
+        directory = os.path.dirname(self.prefix)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.running = True
+        self.thread = threading.Thread(target=self._write_loop, name="detection-log", daemon=True)
+        self.thread.start()
+        return self
+    
+    def write(self, frame, timestamp, objects, counts):
+        """Queue one frame's detections; never blocks, sheds the frame if the queue is full"""
+        with self.condition:
+            if len(self.queue) >= self.queue_size or not self.running:
+                self.dropped += 1
+                return False
+            # Records are taken now, so later changes to the detections do not reach the log
+            if self.log_format == 'binary':
+                records = [object_fields(obj) for obj in objects]
+            else:
+                records = self.serialize(objects, timestamp)
+            self.queue.append((frame, timestamp, records, dict(counts)))
+            self.queued += 1
+            if len(self.queue) >= self.batch_size:
+                self.condition.notify_all()
+            return True
+    
+    def _write_loop(self):
+        """Write queued frames in batches, flushing at least every flush_interval"""
+        try:
+            while True:
+                with self.condition:
+                    if self.running and len(self.queue) < self.batch_size and self.written >= self.flushing:
+                        self.condition.wait(self.flush_interval)
+                    batch = list(self.queue)
+                    self.queue.clear()
+                    stopping = not self.running
+                
+                if batch:
+                    self._write_batch(batch)
+                    with self.condition:
+                        self.condition.notify_all()
+                if stopping:
+                    break
+        except Exception as e:
+            self.error = e
+            with self.condition:
+                self.running = False
+        finally:
+            if self.file is not None:
+                self.file.close()
+                self.file = None
+    
+    def _open_file(self):
+        if self.file is not None:
+            self.file.close()
+        stamp = time.strftime('%Y%m%d-%H%M%S')
+        path = f"{self.prefix}_{stamp}_{len(self.files):04d}{self.formats[self.log_format]}"
+        self.file = open(path, 'wb')
+        self.files.append(path)
+        self.file_bytes = 0
+        self.file_opened = time.time()
+        if self.log_format == 'binary':
+            self.file.write(BINARY_MAGIC)
+            self.file_bytes = len(BINARY_MAGIC)
+    
+    def _write_batch(self, batch):
+        """Encode, append and flush one batch, rotating the file by size or age"""
+        if (self.file is None or self.file_bytes >= self.max_bytes
+                or time.time() - self.file_opened >= self.max_seconds):
+            self._open_file()
+        
+        if self.log_format == 'binary':
+            data = encode_binary_block(batch)
+        else:
+            lines = []
+            for frame, timestamp, records, counts in batch:
+                record = {
+                    'frame': frame,
+                    'time': timestamp,
+                    'counts': counts,
+                    'objects': records
+                }
+                lines.append(json.dumps(record))
+            data = ("\n".join(lines) + "\n").encode()
+        
+        self.file.write(data)
+        self.file.flush()
+        self.file_bytes += len(data)
+        self.written += len(batch)
+    
+    def flush(self, timeout=None):
+        """Write the frames queued so far without waiting for a full batch; False if they are not
+        written within the timeout"""
+        with self.condition:
+            queued = self.queued
+            self.flushing = max(self.flushing, queued)
+            self.condition.notify_all()
+            self.condition.wait_for(lambda: self.written >= queued or not self.running, timeout)
+            return self.written >= queued
+    
+    def stop(self):
+        """Write what is still queued and stop the writer thread"""
+        with self.condition:
+            self.running = False
+            self.condition.notify_all()
+        if self.thread is not None:
+            self.thread.join(timeout=5.0)
+            self.thread = None
+    
+    def summary(self):
+        return (f"Detection log: {self.written} frames written to {len(self.files)} file(s), "
+                f"{self.dropped} dropped")
@@ -0,0 +1,71 @@
+import threading
+import time
+
+class LatestResult:
+    """Single-slot hand-off between threads; a newer result replaces an unread one"""
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.value = None
+        self.closed = False
+        self.replaced = 0
+    
+    def put(self, value):
+        with self.condition:
+            if self.value is not None:
+                self.replaced += 1
+            self.value = value
+            self.condition.notify_all()
+    
+    def take(self, timeout=None):
+        """Return the newest unread result, or None if nothing arrived within timeout"""
+        with self.condition:
+            deadline = None if timeout is None else time.perf_counter() + timeout
+            while self.value is None and not self.closed:
+                remaining = None if deadline is None else deadline - time.perf_counter()
+                if remaining is not None and remaining <= 0:
+                    return None
+                self.condition.wait(remaining)
+            
+            value, self.value = self.value, None
+            return value
+    
+    def close(self):
+        """Wake the reader; take() returns None once the last result was read"""
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+
+class ResultThread:
+    """Runs a result iterator on a background thread, publishing into a LatestResult"""
+    def __init__(self, results, on_result=None):
+        self.results = results
+        self.on_result = on_result
+        self.latest = LatestResult()
+        self.produced = 0
+        self.error = None
+        self.thread = None
+    
+    def start(self):
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+        return self
+    
+    def _run(self):
+        try:
+            for result in self.results:
+                if self.on_result is not None:
+                    self.on_result(result)
+                self.latest.put(result)
+                self.produced += 1
+        except Exception as e:
+            self.error = e
+        finally:
+            self.latest.close()
+    
+    @property
+    def finished(self):
+        return self.latest.closed
+    
+    def join(self, timeout=None):
+        if self.thread is not None:
+            self.thread.join(timeout)
@@ -0,0 +1,131 @@
+import cv2
+import numpy as np
+import time
+
+class EdgeMaps:
+    """Lazily computed edge maps of one frame, indexed like a dict"""
+    names = ('canny', 'sobel', 'laplacian', 'combined')
+    
+    def __init__(self, gray=None, frame=None):
+        # Keep the source image only; nothing is computed until a map is requested
+        self._gray = gray
+        self.frame = frame
+        self.maps = {}
+        self.timings = {}
+    
+    @property
+    def gray(self):
+        """Grayscale source, converted from the BGR frame on first use"""
+        if self._gray is None:
+            self._gray = cv2.cvtColor(self.frame, cv2.COLOR_BGR2GRAY)
+            self.frame = None
+        return self._gray
+    
+    def __contains__(self, name):
+        return name in self.names
+    
+    def __getitem__(self, name):
+        if name not in self.names:
+            raise KeyError(name)
+        if name not in self.maps:
+            nested = sum(self.timings.values())
+            start = time.perf_counter()
+            self.maps[name] = getattr(self, f'compute_{name}')()
+            # Time spent on this map alone (maps it pulled in are timed separately)
+            elapsed = (time.perf_counter() - start) * 1000
+            self.timings[name] = elapsed - (sum(self.timings.values()) - nested)
+        return self.maps[name]
+    
+    def __iter__(self):
+        return iter(self.names)
+    
+    def __len__(self):
+        return len(self.names)
+    
+    def keys(self):
+        return list(self.names)
+    
+    def items(self):
+        return [(name, self[name]) for name in self.names]
+    
+    def get(self, name, default=None):
+        return self[name] if name in self else default
+    
+    @staticmethod
+    def dependencies(name):
+        """Maps another map is built from"""
+        return ('canny', 'sobel', 'laplacian') if name == 'combined' else ()
+    
+    def compute_canny(self):
+        """Canny on the blurred frame"""
+        blurred = cv2.GaussianBlur(self.gray, (5, 5), 0)
+        return cv2.Canny(blurred, 50, 150)
+    
+    def compute_sobel(self):
+        """Gradient magnitude scaled to 0-255"""
+        sobelx = cv2.Sobel(self.gray, cv2.CV_32F, 1, 0, ksize=3)
+        sobely = cv2.Sobel(self.gray, cv2.CV_32F, 0, 1, ksize=3)
+        magnitude = cv2.magnitude(sobelx, sobely)
+        max_value = cv2.minMaxLoc(magnitude)[1]
+        if max_value == 0:
+            return np.zeros(self.gray.shape, dtype=np.uint8)
+        return cv2.convertScaleAbs(magnitude, alpha=255.0 / max_value)
+    
+    def compute_laplacian(self):
+        """Absolute Laplacian, saturated to 8 bits"""
+        laplacian = cv2.Laplacian(self.gray, cv2.CV_16S)
+        return cv2.convertScaleAbs(laplacian)
+    
+    def compute_combined(self):
+        """Union of Canny, Sobel and Laplacian"""
+        return cv2.bitwise_or(self['canny'], cv2.bitwise_or(self['sobel'], self['laplacian']))
+
+def eager_edge_maps(gray):
+    """Reference implementation of the original float64 edge pipeline"""
+    blurred = cv2.GaussianBlur(gray, (5, 5), 0)
+    canny = cv2.Canny(blurred, 50, 150)
+    sobelx = cv2.Sobel(gray, cv2.CV_64F, 1, 0, ksize=3)
+    sobely = cv2.Sobel(gray, cv2.CV_64F, 0, 1, ksize=3)
+    sobel = np.sqrt(sobelx**2 + sobely**2)
+    sobel = np.uint8(sobel / sobel.max() * 255)
+    laplacian = cv2.Laplacian(gray, cv2.CV_64F)
+    laplacian = np.uint8(np.absolute(laplacian))
+    combined = cv2.bitwise_or(canny, cv2.bitwise_or(sobel, laplacian))
+    return canny, sobel, laplacian, combined
+
+def edge_cost_breakdown(frame, repeats=20):
+    """Average cost in ms of each edge map, the lazy total and the old eager pipeline"""
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    costs = {name: 0.0 for name in EdgeMaps.names}
+    
+    for _ in range(repeats):
+        for name in EdgeMaps.names:
+            # Fresh instance per map so each timing includes only that map's own work
+            maps = EdgeMaps(gray)
+            for dep in EdgeMaps.dependencies(name):
+                maps[dep]
+            maps[name]
+            costs[name] += maps.timings[name] / repeats
+    
+    costs['lazy_all'] = sum(costs.values())
+    costs['lazy_none'] = 0.0
+    
+    start = time.perf_counter()
+    for _ in range(repeats):
+        eager_edge_maps(gray)
+    costs['eager_all'] = (time.perf_counter() - start) * 1000 / repeats
+    return costs
+
+def main():
+    from scenes import demo_image
+    
+    base = demo_image()
+    print("\nEdge map cost breakdown (ms per frame):")
+    for width, height in [(640, 480), (1280, 720), (1920, 1080)]:
+        frame = cv2.resize(base, (width, height))
+        costs = edge_cost_breakdown(frame)
+        details = ", ".join(f"{name}: {cost:.2f}" for name, cost in costs.items())
+        print(f"  {width}x{height} - {details}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+import cv2
+import numpy as np
+import time
+
+def lookup(table, indices, out, index):
+    """table[indices] written to out, with index an intp buffer of the same shape; np.take would
+    otherwise allocate an intp copy of the indices and a buffered copy of out"""
+    np.copyto(index, indices)
+    return np.take(table, index, out=out, mode='clip')
+
+class ScratchPool:
+    """Named image buffers reused from frame to frame while the frame size stays the same"""
+    def __init__(self, reshape=False):
+        self.buffers = {}
+        # Keep buffers flat and hand out any shape that fits, for images whose size changes
+        # from call to call (motion-gated regions)
+        self.reshape = reshape
+        self.allocations = 0
+    
+    def get(self, key, shape, dtype=np.uint8):
+        """Buffer for `key`; reallocated only when the shape or type changes, or in reshape mode
+        when it is too small"""
+        buffer = self.buffers.get(key)
+        if self.reshape:
+            size = int(np.prod(shape))
+            if buffer is None or buffer.size < size or buffer.dtype != dtype:
+                buffer = self.buffers[key] = np.empty(size, dtype=dtype)
+                self.allocations += 1
+            return buffer[:size].reshape(shape)
+        if buffer is None or buffer.shape != tuple(shape) or buffer.dtype != dtype:
+            buffer = self.buffers[key] = np.empty(shape, dtype=dtype)
+            self.allocations += 1
+        return buffer
+    
+    def rows(self, key, count, columns=(), dtype=np.int32):
+        """First count rows of a buffer for `key`, for per-blob arrays whose length changes from
+        frame to frame; it grows to twice the rows asked for when it is too short"""
+        buffer = self.buffers.get(key)
+        if buffer is None or len(buffer) < count or buffer.shape[1:] != tuple(columns) or buffer.dtype != dtype:
+            buffer = self.buffers[key] = np.empty((2 * count,) + tuple(columns), dtype=dtype)
+            self.allocations += 1
+        return buffer[:count]
+
+class FrameContext:
+    """Intermediate images of one frame, each computed on first request and shared by every stage"""
+    # Pooled images are overwritten by the next frame and must not outlive this one; gray gets
+    # its own memory unless pooled_gray says nothing keeps it (edge maps, optical flow)
+    def __init__(self, frame, pool=None, pooled_gray=False):
+        self.frame = frame
+        self.pool = pool if pool is not None else ScratchPool()
+        self.pooled_gray = pooled_gray
+        self.images = {}
+        self.costs = {}
+        self.pool_allocations = self.pool.allocations
+        self.fresh = 0
+        
+        # Statistics
+        self.hits = 0
+        self.saved_ms = 0.0
+    
+    def derived(self, key, compute):
+        """compute() on the first request for `key`, the stored image after that"""
+        if key in self.images:
+            self.hits += 1
+            self.saved_ms += self.costs[key]
+            return self.images[key]
+        nested = sum(self.costs.values())
+        start = time.perf_counter()
+        image = self.images[key] = compute()
+        # Cost of this image alone (images it pulled in are charged separately)
+        elapsed = (time.perf_counter() - start) * 1000
+        self.costs[key] = elapsed - (sum(self.costs.values()) - nested)
+        return image
+    
+    def scratch(self, key, shape=None, dtype=np.uint8):
+        """Pool buffer for one intermediate, frame-sized single channel by default"""
+        return self.pool.get(key, self.frame.shape[:2] if shape is None else shape, dtype)
+    
+    @property
+    def allocations(self):
+        """Image buffers allocated for this frame"""
+        return self.pool.allocations - self.pool_allocations + self.fresh
+    
+    def gray(self):
+        def compute():
+            if self.pooled_gray:
+                return cv2.cvtColor(self.frame, cv2.COLOR_BGR2GRAY, dst=self.scratch('gray'))
+            self.fresh += 1
+            return cv2.cvtColor(self.frame, cv2.COLOR_BGR2GRAY)
+        return self.derived('gray', compute)
+    
+    def hsv(self):
+        return self.derived('hsv', lambda: cv2.cvtColor(self.frame, cv2.COLOR_BGR2HSV,
+                                                        dst=self.scratch('hsv', self.frame.shape)))
+    
+    def blurred(self, ksize):
+        """Gray image after a ksize x ksize Gaussian blur"""
+        key = ('blurred', ksize)
+        return self.derived(key, lambda: cv2.GaussianBlur(self.gray(), (ksize, ksize), 0, dst=self.scratch(key)))
+    
+    def threshold(self, value, ksize):
+        """Binary mask of the ksize-blurred gray image above `value`"""
+        key = ('threshold', value, ksize)
+        return self.derived(key, lambda: cv2.threshold(self.blurred(ksize), value, 255, cv2.THRESH_BINARY,
+                                                       dst=self.scratch(key))[1])
+    
+    def report(self, clock):
+        """Charge this frame's allocations and reuse to a stage clock's counters"""
+        clock.count('allocations', self.allocations)
+        clock.count('cache hits', self.hits)
+        clock.count('saved ms', self.saved_ms)
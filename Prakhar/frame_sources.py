@@ -0,0 +1,345 @@
+import cv2
+import numpy as np
+import threading
+import os
+import struct
+import time
+
+RECORDING_MAGIC = b'AETHREC1'
+
+class FrameSource:
+    """Frame source with the cv2.VideoCapture read interface that opens on first use"""
+    # Live sources produce frames in real time; the others can be read as fast as needed
+    live = False
+    
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.opened = None
+        self.opener = None
+    
+    def _open(self):
+        """Acquire the underlying device or files; returns True on success"""
+        return True
+    
+    def _read(self):
+        raise NotImplementedError
+    
+    def _release(self):
+        pass
+    
+    def open(self):
+        """Open the source unless already attempted; returns whether it is open"""
+        with self.lock:
+            if self.opened is None:
+                try:
+                    self.opened = bool(self._open())
+                except (IOError, OSError, ValueError) as e:
+                    print(f"Could not open {self.describe()}: {e}")
+                    self.opened = False
+            return self.opened
+    
+    def open_async(self):
+        """Start opening on a background thread; reads wait for it to finish"""
+        if self.opener is None:
+            self.opener = threading.Thread(target=self.open, name="source-open", daemon=True)
+            self.opener.start()
+        return self
+    
+    def isOpened(self):
+        return self.open()
+    
+    def read(self):
+        """Return (ret, frame) like cv2.VideoCapture.read"""
+        if not self.open():
+            return False, None
+        return self._read()
+    
+    def release(self):
+        with self.lock:
+            if self.opened:
+                self._release()
+            self.opened = None
+    
+    def describe(self):
+        return type(self).__name__
+
+class CameraSource(FrameSource):
+    """Camera device through cv2.VideoCapture"""
+    live = True
+    
+    def __init__(self, index=0, width=None, height=None):
+        super().__init__()
+        self.index = index
+        self.width = width
+        self.height = height
+        self.cap = None
+    
+    def _open(self):
+        self.cap = cv2.VideoCapture(self.index)
+        if self.width:
+            self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, self.width)
+        if self.height:
+            self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, self.height)
+        return self.cap.isOpened()
+    
+    def _read(self):
+        return self.cap.read()
+    
+    def _release(self):
+        self.cap.release()
+    
+    def describe(self):
+        return f"camera {self.index}"
+
+class VideoFileSource(FrameSource):
+    """Video file reader with start/end seeking, frame striding and looping"""
+    def __init__(self, path, stride=1, start=None, end=None, sample_fps=None, loop=False):
+        super().__init__()
+        self.path = path
+        self.requested_stride = stride
+        self.start = start
+        self.end = end
+        self.sample_fps = sample_fps
+        # Restart at the start frame after the end frame or the end of the file
+        self.loop = loop
+        self.cap = None
+        self.fps = 30.0
+        self.stride = max(1, int(stride))
+        self.start_frame = 0
+        self.end_frame = None
+        self.position = 0
+    
+    def _open(self):
+        self.cap = cv2.VideoCapture(self.path)
+        self.fps = self.cap.get(cv2.CAP_PROP_FPS) or 30.0
+        
+        # A target sample rate overrides the stride
+        stride = self.requested_stride
+        if self.sample_fps:
+            stride = max(1, int(round(self.fps / self.sample_fps)))
+        self.stride = max(1, int(stride))
+        
+        self.start_frame = int(round(self.start * self.fps)) if self.start else 0
+        self.end_frame = int(round(self.end * self.fps)) if self.end is not None else None
+        if self.start_frame:
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, self.start_frame)
+        self.position = self.start_frame
+        return self.cap.isOpened()
+    
+    def _read(self):
+        """Decode the next sampled frame, skipping stride - 1 frames after it"""
+        ret, frame = self._decode()
+        if not ret and self.loop and self.position > self.start_frame:
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, self.start_frame)
+            self.position = self.start_frame
+            ret, frame = self._decode()
+        if not ret:
+            return False, None
+        
+        # grab() skips the colour conversion and copy of frames we do not analyse
+        for _ in range(self.stride - 1):
+            if self.end_frame is not None and self.position >= self.end_frame:
+                break
+            if not self.cap.grab():
+                break
+            self.position += 1
+        
+        return True, frame
+    
+    def _decode(self):
+        if self.end_frame is not None and self.position >= self.end_frame:
+            return False, None
+        ret, frame = self.cap.read()
+        if ret:
+            self.position += 1
+        return ret, frame
+    
+    def frame_number(self, sample_index):
+        """Source frame number of the n-th sampled frame"""
+        return self.start_frame + sample_index * self.stride
+    
+    def _release(self):
+        self.cap.release()
+    
+    def describe(self):
+        return f"video {self.path}"
+
+class ImageDirectorySource(FrameSource):
+    """Image files of a directory in name order"""
+    extensions = ('.png', '.jpg', '.jpeg', '.bmp', '.tif', '.tiff')
+    
+    def __init__(self, directory, loop=False):
+        super().__init__()
+        self.directory = directory
+        self.loop = loop
+        self.paths = []
+        self.index = 0
+        # Index after the last image that decoded; looping stops after a whole pass without one
+        self.decoded = 0
+    
+    def _open(self):
+        self.paths = sorted(os.path.join(self.directory, name) for name in os.listdir(self.directory)
+                            if name.lower().endswith(self.extensions))
+        self.index = 0
+        self.decoded = 0
+        return bool(self.paths)
+    
+    def _read(self):
+        while self.index < len(self.paths) or (self.loop and self.index - self.decoded < len(self.paths)):
+            path = self.paths[self.index % len(self.paths)]
+            self.index += 1
+            frame = cv2.imread(path, cv2.IMREAD_COLOR)
+            if frame is not None:
+                self.decoded = self.index
+                return True, frame
+        return False, None
+    
+    def describe(self):
+        return f"image directory {self.directory}"
+
+class SyntheticSource(FrameSource):
+    """Generated demo-object frames held in memory; reads return copies"""
+    def __init__(self, count=100, width=1280, height=720, loop=False):
+        super().__init__()
+        self.count = count
+        self.width = width
+        self.height = height
+        self.loop = loop
+        self.frames = []
+        self.index = 0
+    
+    def _open(self):
+        from scenes import synthetic_frames
+        
+        self.frames = list(synthetic_frames(self.count, self.width, self.height))
+        self.index = 0
+        return bool(self.frames)
+    
+    def _read(self):
+        if self.index >= len(self.frames) and not self.loop:
+            return False, None
+        frame = self.frames[self.index % len(self.frames)]
+        self.index += 1
+        return True, frame.copy()
+    
+    def _release(self):
+        self.frames = []
+    
+    def describe(self):
+        return f"synthetic {self.width}x{self.height}"
+
+class ReplaySource(FrameSource):
+    """Frames of a recording made by RecordingSource, bit-exact and in order"""
+    def __init__(self, path, realtime=False, loop=False):
+        super().__init__()
+        self.path = path
+        # realtime keeps the recorded frame spacing; otherwise frames come at full speed
+        self.realtime = realtime
+        self.loop = loop
+        self.file = None
+        self.first_stamp = None
+        self.started = None
+    
+    def _open(self):
+        self.file = open(self.path, 'rb')
+        if self.file.read(len(RECORDING_MAGIC)) != RECORDING_MAGIC:
+            self.file.close()
+            raise ValueError("not a frame recording")
+        self.first_stamp = None
+        return True
+    
+    def _read(self):
+        header = self.file.read(12)
+        if len(header) < 12 and self.loop and self.first_stamp is not None:
+            self.file.seek(len(RECORDING_MAGIC))
+            self.first_stamp = None
+            header = self.file.read(12)
+        if len(header) < 12:
+            return False, None
+        
+        stamp, size = struct.unpack('<dI', header)
+        frame = cv2.imdecode(np.frombuffer(self.file.read(size), dtype=np.uint8), cv2.IMREAD_COLOR)
+        
+        if self.first_stamp is None:
+            self.first_stamp = stamp
+            self.started = time.perf_counter()
+        elif self.realtime:
+            delay = (stamp - self.first_stamp) - (time.perf_counter() - self.started)
+            if delay > 0:
+                time.sleep(delay)
+        return frame is not None, frame
+    
+    def _release(self):
+        self.file.close()
+    
+    def describe(self):
+        return f"recording {self.path}"
+
+class RecordingSource(FrameSource):
+    """Wraps another source and records every frame it returns for ReplaySource"""
+    def __init__(self, source, path):
+        super().__init__()
+        self.source = source
+        self.live = source.live
+        self.path = path
+        self.file = None
+        self.recorded = 0
+    
+    def open_async(self):
+        self.source.open_async()
+        return self
+    
+    def _open(self):
+        if not self.source.open():
+            return False
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.file = open(self.path, 'wb')
+        self.file.write(RECORDING_MAGIC)
+        return True
+    
+    def _read(self):
+        ret, frame = self.source.read()
+        if ret:
+            # PNG keeps the frames lossless, so a replay reproduces the run exactly
+            data = cv2.imencode('.png', frame, [cv2.IMWRITE_PNG_COMPRESSION, 1])[1].tobytes()
+            self.file.write(struct.pack('<dI', time.time(), len(data)))
+            self.file.write(data)
+            self.recorded += 1
+        return ret, frame
+    
+    def _release(self):
+        self.file.close()
+        self.source.release()
+    
+    def describe(self):
+        return f"{self.source.describe()} (recording to {self.path})"
+
+def open_source(spec, record=None, loop=False):
+    """Frame source for a command-line spec: camera index, image directory, .rec recording,
+    'synthetic' or 'synthetic:WIDTHxHEIGHT', or a video file; `record` also saves its frames"""
+    source = _source_for(str(spec), loop)
+    if record:
+        source = RecordingSource(source, record)
+    return source
+
+def add_source_arguments(parser):
+    parser.add_argument('--source', default='0',
+                        help="Camera index, video file, image directory, .rec recording or synthetic[:WIDTHxHEIGHT]")
+    parser.add_argument('--record', help="Also record the frames to this .rec file for exact replay")
+    parser.add_argument('--loop', action='store_true', help="Restart finite sources at their end")
+
+def _source_for(spec, loop):
+    if spec.isdigit():
+        return CameraSource(int(spec))
+    if spec.startswith('synthetic'):
+        width, height = 1280, 720
+        if ':' in spec:
+            width, height = (int(value) for value in spec.split(':', 1)[1].lower().split('x'))
+        return SyntheticSource(100, width, height, loop=loop)
+    if os.path.isdir(spec):
+        return ImageDirectorySource(spec, loop=loop)
+    if spec.endswith('.rec'):
+        return ReplaySource(spec, loop=loop)
+    return VideoFileSource(spec, loop=loop)
@@ -0,0 +1,81 @@
+from collections import deque
+import threading
+import time
+
+class QualityGovernor:
+    """Steps pipeline quality down while frames run over a time budget, and back up with headroom"""
+    # Each level keeps the reductions of the levels before it
+    levels = ('full quality', 'no edge maps', 'reduced resolution', 'every other frame', 'mean hex color')
+    
+    def __init__(self, budget_ms, window=30, headroom=0.9, on_change=None):
+        self.budget_ms = budget_ms
+        # Frames averaged before each decision; the window restarts at every change
+        self.window = window
+        # Step up only if the level above is expected to need less than this share of the budget
+        self.headroom = headroom
+        # on_change(level, previous_level, mean_ms)
+        self.on_change = on_change
+        
+        self.costs = deque(maxlen=window)
+        # Work done for the pipeline on other threads (e.g. display-side edge maps), added to the next frame
+        self.charged_ms = 0.0
+        self.charge_lock = threading.Lock()
+        self.level = 0
+        # Cost of level n + 1 relative to level n, measured across each change between them
+        self.step_ratios = {}
+        # (previous level, its mean cost) until the first full window at the new level
+        self.last_change = None
+        
+        # Statistics
+        self.transitions = []
+        self.frames_per_level = [0] * len(self.levels)
+    
+    def charge(self, ms):
+        """Add work done on another thread to the cost of the next frame"""
+        with self.charge_lock:
+            self.charged_ms += ms
+    
+    def update(self, frame_ms):
+        """Add the processing cost of one input frame (0 for a skipped one); returns the level"""
+        with self.charge_lock:
+            frame_ms += self.charged_ms
+            self.charged_ms = 0.0
+        self.costs.append(frame_ms)
+        self.frames_per_level[self.level] += 1
+        if len(self.costs) < self.window:
+            return self.level
+        
+        mean = sum(self.costs) / len(self.costs)
+        if self.last_change is not None:
+            # Both means were taken back to back, under about the same load
+            previous, previous_mean = self.last_change
+            lower, higher = sorted(((previous, previous_mean), (self.level, mean)))
+            if lower[1] > 0:
+                self.step_ratios[lower[0]] = higher[1] / lower[1]
+            self.last_change = None
+        
+        if mean > self.budget_ms and self.level < len(self.levels) - 1:
+            self._set_level(self.level + 1, mean)
+        elif self.level > 0 and mean < self.headroom * self.budget_ms * self.step_ratios.get(self.level - 1, 0.0):
+            # The level above is expected to cost mean / ratio under the current load
+            self._set_level(self.level - 1, mean)
+        return self.level
+    
+    def _set_level(self, level, mean):
+        previous = self.level
+        self.level = level
+        self.costs.clear()
+        self.last_change = (previous, mean)
+        self.transitions.append((time.time(), previous, level, mean))
+        if self.on_change is not None:
+            self.on_change(level, previous, mean)
+    
+    def describe(self, level=None):
+        level = self.level if level is None else level
+        return f"{level}/{len(self.levels) - 1} {self.levels[level]}"
+    
+    def summary(self):
+        total = max(1, sum(self.frames_per_level))
+        shares = ", ".join(f"{name} {frames / total:.0%}" for name, frames in zip(self.levels, self.frames_per_level)
+                           if frames)
+        return f"Quality governor ({self.budget_ms:.0f} ms budget): {len(self.transitions)} changes; {shares}"
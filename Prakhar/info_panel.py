@@ -0,0 +1,88 @@
+import cv2
+import numpy as np
+import time
+
+class PanelRenderer:
+    """Side panel composited into a reused frame buffer; the static layer is drawn once per resolution"""
+    def __init__(self, panel_width, draw_static):
+        self.panel_width = panel_width
+        # draw_static(panel) paints the background and fixed labels of an empty panel
+        self.draw_static = draw_static
+        
+        self.size = None
+        self.buffer = None
+        self.static = None
+        self.offset = 0
+        # Panel regions drawn over since the last frame, as (x0, y0, x1, y1)
+        self.dirty = []
+    
+    def begin(self, frame):
+        """Copy the frame next to a clean panel; the returned buffer is reused on the next call"""
+        height, width = frame.shape[:2]
+        if self.size != (height, width):
+            self.size = (height, width)
+            self.offset = width
+            self.static = np.zeros((height, self.panel_width, 3), dtype=np.uint8)
+            self.draw_static(self.static)
+            self.buffer = np.empty((height, width + self.panel_width, 3), dtype=np.uint8)
+            self.buffer[:, width:] = self.static
+            self.dirty = []
+        
+        self.buffer[:, :width] = frame
+        
+        # Only what the previous frame drew is restored from the static layer
+        panel = self.buffer[:, width:]
+        for x0, y0, x1, y1 in self.dirty:
+            panel[y0:y1, x0:x1] = self.static[y0:y1, x0:x1]
+        self.dirty = []
+        return self.buffer
+    
+    def _mark(self, x0, y0, x1, y1):
+        height = self.size[0]
+        x0, y0 = max(x0, 0), max(y0, 0)
+        x1, y1 = min(x1, self.panel_width), min(y1, height)
+        if x0 < x1 and y0 < y1:
+            self.dirty.append((x0, y0, x1, y1))
+    
+    def text(self, text, org, scale, color, thickness=1, font=cv2.FONT_HERSHEY_SIMPLEX):
+        """putText at panel coordinates"""
+        x, y = org
+        cv2.putText(self.buffer, text, (self.offset + x, y), font, scale, color, thickness)
+        (w, h), baseline = cv2.getTextSize(text, font, scale, thickness)
+        margin = thickness + 2
+        self._mark(x - margin, y - h - margin, x + w + margin, y + baseline + margin)
+    
+    def rectangle(self, pt1, pt2, color, thickness=1):
+        """rectangle at panel coordinates"""
+        (x0, y0), (x1, y1) = pt1, pt2
+        cv2.rectangle(self.buffer, (self.offset + x0, y0), (self.offset + x1, y1), color, thickness)
+        margin = max(thickness, 0) + 1
+        self._mark(min(x0, x1) - margin, min(y0, y1) - margin, max(x0, x1) + margin + 1, max(y0, y1) + margin + 1)
+
+def benchmark_panel(width=1920, height=1080, frames=30):
+    """Milliseconds per frame for detection and for panel rendering"""
+    from advanced_machine_vision import AdvancedMachineVision
+    from scenes import synthetic_frames
+    
+    vision_system = AdvancedMachineVision(open_camera=False)
+    process_time = 0.0
+    panel_time = 0.0
+    
+    for frame in synthetic_frames(frames, width, height):
+        start = time.perf_counter()
+        processed_frame, detected_objects, object_counts, _ = vision_system.process_frame_advanced(frame.copy())
+        process_time += time.perf_counter() - start
+        
+        start = time.perf_counter()
+        vision_system.draw_advanced_info_panel(processed_frame, detected_objects, object_counts)
+        panel_time += time.perf_counter() - start
+    
+    return process_time * 1000 / frames, panel_time * 1000 / frames
+
+def main():
+    process_ms, panel_ms = benchmark_panel()
+    print(f"\nAt 1920x1080: detection {process_ms:.2f} ms/frame, info panel {panel_ms:.2f} ms/frame "
+          f"({panel_ms / (process_ms + panel_ms) * 100:.1f}% of frame time)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+import cv2
+import numpy as np
+import argparse
+import time
+
+from color_engine import ContourMask
+
+def group_medians(values, owners, n_groups):
+    """Lower median of values per owner index; NaN for owners without values"""
+    medians = np.full(n_groups, np.nan)
+    if len(values) == 0:
+        return medians
+    
+    counts = np.bincount(owners, minlength=n_groups)
+    order = np.lexsort((values, owners))
+    starts = np.cumsum(counts) - counts
+    present = counts > 0
+    medians[present] = values[order][starts[present] + (counts[present] - 1) // 2]
+    return medians
+
+class FlowPropagator:
+    """Moves keyframe detections forward with sparse Lucas-Kanade optical flow"""
+    def __init__(self, points_per_object=12, min_tracked=0.5, win_size=21, max_level=3):
+        self.points_per_object = points_per_object
+        self.min_tracked = min_tracked
+        self.lk_params = dict(winSize=(win_size, win_size), maxLevel=max_level,
+                              criteria=(cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT, 20, 0.03))
+        self.contour_mask = ContourMask()
+        
+        self.objects = []
+        self.prev_gray = None
+        self.points = None
+        self.owners = None
+        self.seeded = 0
+        # Displacement of each keyframe object since its keyframe
+        self.offsets = np.zeros((0, 2))
+        self.frames_since_keyframe = 0
+    
+    def seed_points(self, gray, obj):
+        """Corners inside the object's contour (or box) to follow with optical flow"""
+        contour = obj.get('contour')
+        if contour is not None:
+            (x, y, w, h), mask = self.contour_mask.get(contour)
+        else:
+            x, y, w, h = obj['bbox']
+            mask = None
+        
+        corners = cv2.goodFeaturesToTrack(gray[y:y + h, x:x + w], self.points_per_object, 0.01, 3, mask=mask)
+        points = np.empty((0, 2), dtype=np.float32) if corners is None else corners.reshape(-1, 2) + [x, y]
+        
+        # Flat-coloured objects have few inner corners; their outline still carries motion
+        if len(points) < self.points_per_object // 2 and contour is not None:
+            outline = contour.reshape(-1, 2)
+            step = max(1, len(outline) // self.points_per_object)
+            points = np.concatenate([points, outline[::step]])
+        if len(points) == 0:
+            return np.array([obj['center']], dtype=np.float32)
+        return points.astype(np.float32)
+    
+    def set_keyframe(self, gray, objects):
+        """Start propagating the objects fully detected on this frame"""
+        self.objects = list(objects)
+        self.prev_gray = gray
+        self.offsets = np.zeros((len(self.objects), 2))
+        self.frames_since_keyframe = 0
+        
+        points = [self.seed_points(gray, obj) for obj in self.objects]
+        if points:
+            self.owners = np.repeat(np.arange(len(points)), [len(p) for p in points])
+            self.points = np.concatenate(points).reshape(-1, 1, 2).astype(np.float32)
+        else:
+            self.owners = np.empty(0, dtype=np.int64)
+            self.points = np.empty((0, 1, 2), dtype=np.float32)
+        self.seeded = len(self.owners)
+    
+    def needs_keyframe(self, interval):
+        return self.prev_gray is None or self.frames_since_keyframe + 1 >= interval
+    
+    def propagate(self, gray, max_motion=None):
+        """Keyframe objects moved to this frame, or None if tracking was lost"""
+        if len(self.points):
+            moved, status, _ = cv2.calcOpticalFlowPyrLK(self.prev_gray, gray, self.points, None, **self.lk_params)
+            good = status.reshape(-1) == 1
+            
+            # Each object moves by the median motion of its surviving points
+            step = (moved - self.points).reshape(-1, 2)[good]
+            owners = self.owners[good]
+            dx = group_medians(step[:, 0], owners, len(self.objects))
+            dy = group_medians(step[:, 1], owners, len(self.objects))
+            
+            if np.isnan(dx).any() or good.sum() < self.min_tracked * self.seeded:
+                return None
+            self.offsets += np.column_stack((dx, dy))
+            self.points = moved[good]
+            self.owners = owners
+        
+        if max_motion is not None and len(self.offsets) and np.abs(self.offsets).max() > max_motion:
+            return None
+        
+        self.prev_gray = gray
+        self.frames_since_keyframe += 1
+        
+        propagated = []
+        for obj, (dx, dy) in zip(self.objects, np.rint(self.offsets).astype(int)):
+            moved_obj = obj.translated(int(dx), int(dy))
+            if moved_obj.age is not None:
+                moved_obj.age += self.frames_since_keyframe
+            propagated.append(moved_obj)
+        return propagated
+
+def benchmark_keyframes(frames, intervals=(1, 5, 10), max_motion=40):
+    """Frames per second and center drift against full detection for each keyframe interval"""
+    from advanced_machine_vision import AdvancedMachineVision
+    from tracking import match_detections
+    
+    # Reference: full detection on every frame
+    reference_system = AdvancedMachineVision(open_camera=False)
+    reference = [reference_system.process_frame_advanced(frame.copy())[1] for frame in frames]
+    results = []
+    
+    for interval in intervals:
+        system = AdvancedMachineVision(open_camera=False)
+        system.keyframe_interval = interval
+        system.keyframe_motion = max_motion
+        
+        start = time.perf_counter()
+        outputs = [system.process_frame_advanced(frame.copy())[1] for frame in frames]
+        fps = len(frames) / (time.perf_counter() - start)
+        
+        errors = []
+        missed = 0
+        for objects, expected in zip(outputs, reference):
+            centers = [obj['center'] for obj in objects]
+            expected_centers = np.array([obj['center'] for obj in expected], dtype=np.float64).reshape(-1, 2)
+            matches = match_detections(expected_centers, centers, 50)
+            found = matches >= 0
+            missed += int((~found).sum())
+            if found.any():
+                diff = expected_centers[found] - np.array(centers, dtype=np.float64)[matches[found]]
+                errors.extend(np.sqrt((diff**2).sum(axis=1)))
+        
+        total = sum(len(expected) for expected in reference)
+        drift = float(np.mean(errors)) if errors else 0.0
+        results.append((interval, fps, drift, missed / total if total else 0.0, system.keyframes))
+    
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Keyframe detection with optical-flow propagation")
+    parser.add_argument('video', nargs='?', help="Recorded clip (default: synthetic scene)")
+    parser.add_argument('--frames', type=int, default=60)
+    parser.add_argument('--intervals', type=int, nargs='+', default=[1, 3, 5, 10])
+    parser.add_argument('--max-motion', type=float, default=40, help="Pixels an object may move before a new keyframe")
+    args = parser.parse_args()
+    
+    if args.video:
+        cap = cv2.VideoCapture(args.video)
+        frames = []
+        while len(frames) < args.frames:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            frames.append(frame)
+        cap.release()
+    else:
+        from scenes import synthetic_frames
+        frames = list(synthetic_frames(args.frames, 1280, 720))
+    
+    print(f"\nKeyframe propagation over {len(frames)} frames:")
+    results = benchmark_keyframes(frames, args.intervals, args.max_motion)
+    base_fps = results[0][1]
+    for interval, fps, drift, missed, keyframes in results:
+        print(f"  every {interval:2d}: {fps:6.1f} FPS ({fps / base_fps:.2f}x), {keyframes:3d} keyframes, "
+              f"drift {drift:5.2f} px, missed {missed * 100:4.1f}%")
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,21 @@
 import cv2
 import numpy as np
+import argparse
 import threading
 from collections import defaultdict
 import time
+from color_engine import ColorEngine, ContourMask
+from capture import ThreadedCapture
+from detection import Detection
+from frame_context import FrameContext, ScratchPool
+from frame_sources import CameraSource, add_source_arguments, open_source
+from info_panel import PanelRenderer
+from profiling import NULL_CLOCK
 
 class MachineVisionSystem:
-    def __init__(self):
-        self.cap = cv2.VideoCapture(0)
+    def __init__(self, source=None):
+        # Frame source, opened on first read (camera 0 unless another source is given)
+        self.cap = source if source is not None else CameraSource(0)
         self.running = False
         self.object_counts = defaultdict(int)
         self.detected_objects = []
@@ -20,46 +29,59 @@ class MachineVisionSystem:
             'Orange': [(10, 50, 50), (25, 255, 255)],
             'Purple': [(130, 50, 50), (170, 255, 255)]
         }
+        self.color_engine = ColorEngine(self.color_ranges, union=True)
+        self.contour_mask = ContourMask()
         
         # Shape detection parameters
         self.shape_detector = ShapeDetector()
         
-    def detect_color(self, hsv_frame, contour):
+        # How detections keep their contour: 'compressed', 'full' or 'none'
+        self.contour_mode = 'compressed'
+        
+        # Draw contours, boxes and centers into processed frames (the live loop draws its own)
+        self.draw_annotations = True
+        
+        # Capture stage
+        self.capture_buffer_size = 2
+        self.capture_drop_policy = 'drop_oldest'
+        self.capture = None
+        
+        # Per-stage timing of process_frame (a StageClock to enable it)
+        self.stage_clock = NULL_CLOCK
+        
+        # Intermediate images (HSV, blurs, masks) reuse these buffers while the frame size is unchanged
+        self.scratch = ScratchPool()
+        
+        # Info panel: static layer cached per resolution, drawn into a reused frame
+        self.panel = PanelRenderer(300, self.draw_panel_background)
+        
+    def get_color_engine(self):
+        """Return the color engine, recompiling it if color_ranges was replaced"""
+        if self.color_engine.color_ranges is not self.color_ranges:
+            self.color_engine = ColorEngine(self.color_ranges, union=True)
+        return self.color_engine
+    
+    def detect_color(self, hsv_frame, contour, label_map=None):
         """Detect the dominant color of a contour"""
-        mask = np.zeros(hsv_frame.shape[:2], dtype=np.uint8)
-        cv2.fillPoly(mask, [contour], 255)
+        counts = self.get_color_engine().contour_counts(contour, label_map=label_map, hsv_frame=hsv_frame)
         
-        for color_name, ranges in self.color_ranges.items():
-            color_mask = np.zeros(hsv_frame.shape[:2], dtype=np.uint8)
-            
-            if len(ranges) == 4:  # Red has two ranges
-                lower1, upper1, lower2, upper2 = ranges
-                mask1 = cv2.inRange(hsv_frame, np.array(lower1), np.array(upper1))
-                mask2 = cv2.inRange(hsv_frame, np.array(lower2), np.array(upper2))
-                color_mask = cv2.bitwise_or(mask1, mask2)
-            else:
-                lower, upper = ranges
-                color_mask = cv2.inRange(hsv_frame, np.array(lower), np.array(upper))
-            
-            # Check intersection with object mask
-            intersection = cv2.bitwise_and(mask, color_mask)
-            if cv2.countNonZero(intersection) > 50:  # Threshold for color detection
+        for color_name, pixels in zip(self.color_engine.color_names, counts):
+            if pixels > 50:  # Threshold for color detection
                 return color_name
         
         return 'Unknown'
     
     def get_dominant_color_hex(self, frame, contour):
         """Get the hex value of the dominant color in the contour"""
-        mask = np.zeros(frame.shape[:2], dtype=np.uint8)
-        cv2.fillPoly(mask, [contour], 255)
+        (x, y, w, h), mask = self.contour_mask.get(contour)
+        roi = frame[y:y + h, x:x + w]
         
-        # Get pixels within the contour
-        masked_frame = cv2.bitwise_and(frame, frame, mask=mask)
-        pixels = masked_frame[mask > 0]
-        
-        if len(pixels) > 0:
-            # Calculate mean color
-            mean_color = np.mean(pixels, axis=0)
+        pixel_count = cv2.countNonZero(mask)
+        if pixel_count > 0:
+            # Calculate mean color over the contour pixels only; recover the exact
+            # integer sums so truncation to hex matches a plain sum / count
+            channel_sums = np.round(np.array(cv2.mean(roi, mask=mask)[:3]) * pixel_count)
+            mean_color = channel_sums / pixel_count
             # Convert BGR to hex
             hex_color = "#{:02x}{:02x}{:02x}".format(
                 int(mean_color[2]), int(mean_color[1]), int(mean_color[0])
@@ -68,25 +90,33 @@ class MachineVisionSystem:
         
         return "#000000", [0, 0, 0]
     
-    def detect_edges(self, frame):
+    def detect_edges(self, frame, context=None):
         """Detect edges using Canny edge detection"""
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        blurred = cv2.GaussianBlur(gray, (5, 5), 0)
-        edges = cv2.Canny(blurred, 50, 150)
+        # The edge image is a buffer reused on the next call
+        if context is None:
+            context = FrameContext(frame, self.scratch)
+        edges = cv2.Canny(context.blurred(5), 50, 150, edges=context.scratch('edges'))
         return edges
     
     def process_frame(self, frame):
         """Process a single frame for object detection"""
+        clock = self.stage_clock
+        clock.start()
         height, width = frame.shape[:2]
-        hsv = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)
+        # Gray, HSV and blurs are computed once per frame, before anything is drawn into it
+        context = FrameContext(frame, self.scratch, pooled_gray=True)
+        hsv = context.hsv()
+        clock.lap('conversion')
+        color_labels = self.get_color_engine().classify(hsv, dst=context.scratch('color_labels'))
+        clock.lap('color')
         
         # Edge detection
-        edges = self.detect_edges(frame)
+        edges = self.detect_edges(frame, context)
+        clock.lap('edges')
         
         # Find contours
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        blurred = cv2.GaussianBlur(gray, (7, 7), 0)
-        thresh = cv2.threshold(blurred, 60, 255, cv2.THRESH_BINARY)[1]
+        thresh = context.threshold(60, 7)
+        clock.lap('threshold')
         
         contours, _ = cv2.findContours(thresh, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
         
@@ -102,103 +132,102 @@ class MachineVisionSystem:
             # Get contour properties
             x, y, w, h = cv2.boundingRect(contour)
             center_x, center_y = x + w//2, y + h//2
+            clock.lap('contours')
             
             # Detect shape
             shape = self.shape_detector.detect(contour)
+            clock.lap('shape')
             
             # Detect color
-            color = self.detect_color(hsv, contour)
+            color = self.detect_color(hsv, contour, color_labels)
+            clock.lap('color')
             
             # Get hex color
             hex_color, mean_color = self.get_dominant_color_hex(frame, contour)
+            clock.lap('hex')
             
-            # Circle the object
-            cv2.drawContours(frame, [contour], -1, (0, 255, 0), 2)
-            
-            # Draw bounding box
-            cv2.rectangle(frame, (x, y), (x + w, y + h), (255, 0, 0), 2)
+            # Store object info
+            obj_info = Detection(shape, color, hex_color, area, (center_x, center_y), (x, y, w, h),
+                                 contour=contour, contour_mode=self.contour_mode)
             
-            # Draw center point
-            cv2.circle(frame, (center_x, center_y), 5, (0, 0, 255), -1)
+            if self.draw_annotations:
+                self.draw_detection(frame, obj_info, contour)
+            clock.lap('drawing')
             
-            # Store object info
-            obj_info = {
-                'shape': shape,
-                'color': color,
-                'hex': hex_color,
-                'area': area,
-                'center': (center_x, center_y),
-                'bbox': (x, y, w, h),
-                'contour': contour
-            }
             detected_objects.append(obj_info)
             
             # Count objects by shape and color
             object_key = f"{color} {shape}"
             object_counts[object_key] += 1
+            clock.lap('records')
         
+        clock.lap('contours')
+        context.report(clock)
         return frame, detected_objects, object_counts, edges
     
-    def draw_info_panel(self, frame, detected_objects, object_counts):
-        """Draw information panel on the side of the frame"""
-        height, width = frame.shape[:2]
-        
-        # Create extended frame for info panel
-        panel_width = 300
-        extended_frame = np.zeros((height, width + panel_width, 3), dtype=np.uint8)
-        extended_frame[:, :width] = frame
+    def draw_detection(self, frame, obj, contour=None):
+        """Circle an object and draw its bounding box and center point"""
+        x, y, w, h = obj['bbox']
+        if contour is not None:
+            cv2.drawContours(frame, [contour], -1, (0, 255, 0), 2)
+        cv2.rectangle(frame, (x, y), (x + w, y + h), (255, 0, 0), 2)
+        cv2.circle(frame, obj['center'], 5, (0, 0, 255), -1)
+    
+    def draw_panel_background(self, panel):
+        """Static part of the info panel: background, title and section header"""
+        panel_width = panel.shape[1]
         
         # Draw info panel background
-        cv2.rectangle(extended_frame, (width, 0), (width + panel_width, height), (50, 50, 50), -1)
+        panel[:] = (50, 50, 50)
         
         # Title
-        cv2.putText(extended_frame, "Team-Aetherion - UOWD Aerospace", (width + 10, 30), 
+        cv2.putText(panel, "Team-Aetherion - UOWD Aerospace", (10, 30), 
                    cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
-        cv2.putText(extended_frame, "Machine Vision", (width + 10, 55), 
+        cv2.putText(panel, "Machine Vision", (10, 55), 
                    cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
         
         # Draw line separator
-        cv2.line(extended_frame, (width + 10, 70), (width + panel_width - 10, 70), (255, 255, 255), 1)
-        
-        y_offset = 90
+        cv2.line(panel, (10, 70), (panel_width - 10, 70), (255, 255, 255), 1)
         
         # Object counts
-        cv2.putText(extended_frame, "Object Counts:", (width + 10, y_offset), 
+        cv2.putText(panel, "Object Counts:", (10, 90), 
                    cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 255), 2)
-        y_offset += 25
+    
+    def draw_info_panel(self, frame, detected_objects, object_counts):
+        """Draw information panel on the side of the frame"""
+        # The returned frame is a buffer reused on the next call
+        panel = self.panel
+        extended_frame = panel.begin(frame)
+        
+        y_offset = 115
         
         for obj_type, count in object_counts.items():
-            cv2.putText(extended_frame, f"{obj_type}: {count}", (width + 10, y_offset), 
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
+            panel.text(f"{obj_type}: {count}", (10, y_offset), 0.5, (255, 255, 255), 1)
             y_offset += 20
         
         y_offset += 20
         
         # Individual object details
-        cv2.putText(extended_frame, "Object Details:", (width + 10, y_offset), 
-                   cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 255), 2)
+        panel.text("Object Details:", (10, y_offset), 0.6, (0, 255, 255), 2)
         y_offset += 25
         
         for i, obj in enumerate(detected_objects[:8]):  # Show first 8 objects
             # Object info
-            cv2.putText(extended_frame, f"Obj {i+1}: {obj['color']} {obj['shape']}", 
-                       (width + 10, y_offset), cv2.FONT_HERSHEY_SIMPLEX, 0.4, (255, 255, 255), 1)
+            panel.text(f"Obj {i+1}: {obj['color']} {obj['shape']}", (10, y_offset), 0.4, (255, 255, 255), 1)
             y_offset += 15
             
             # Hex color
-            cv2.putText(extended_frame, f"Hex: {obj['hex']}", 
-                       (width + 10, y_offset), cv2.FONT_HERSHEY_SIMPLEX, 0.4, (200, 200, 200), 1)
+            panel.text(f"Hex: {obj['hex']}", (10, y_offset), 0.4, (200, 200, 200), 1)
             
             # Color swatch
             color_bgr = [int(obj['hex'][5:7], 16), int(obj['hex'][3:5], 16), int(obj['hex'][1:3], 16)]
-            cv2.rectangle(extended_frame, (width + 150, y_offset - 12), (width + 180, y_offset - 2), color_bgr, -1)
-            cv2.rectangle(extended_frame, (width + 150, y_offset - 12), (width + 180, y_offset - 2), (255, 255, 255), 1)
+            panel.rectangle((150, y_offset - 12), (180, y_offset - 2), color_bgr, -1)
+            panel.rectangle((150, y_offset - 12), (180, y_offset - 2), (255, 255, 255), 1)
             
             y_offset += 20
             
             # Area
-            cv2.putText(extended_frame, f"Area: {int(obj['area'])}", 
-                       (width + 10, y_offset), cv2.FONT_HERSHEY_SIMPLEX, 0.4, (200, 200, 200), 1)
+            panel.text(f"Area: {int(obj['area'])}", (10, y_offset), 0.4, (200, 200, 200), 1)
             y_offset += 25
         
         return extended_frame
@@ -206,24 +235,28 @@ class MachineVisionSystem:
     def start_detection(self):
         """Start the real-time detection system"""
         self.running = True
+        self.capture = ThreadedCapture(self.cap, self.capture_buffer_size, self.capture_drop_policy).start()
         
+        # Annotations are drawn into the display buffer, so the captured frame is processed as is
+        self.draw_annotations = False
         while self.running:
-            ret, frame = self.cap.read()
+            ret, frame, capture_time = self.capture.read()
             if not ret:
                 break
             
             # Process frame
-            processed_frame, detected_objects, object_counts, edges = self.process_frame(frame.copy())
+            processed_frame, detected_objects, object_counts, edges = self.process_frame(frame)
             
-            # Draw info panel
+            # Draw info panel, then the objects over the frame part of it
             display_frame = self.draw_info_panel(processed_frame, detected_objects, object_counts)
+            frame_area = display_frame[:, :processed_frame.shape[1]]
+            for obj in detected_objects:
+                self.draw_detection(frame_area, obj, obj.contour)
+            self.capture.record_result(capture_time)
             
-            # Show edge detection in a separate window
-            edges_colored = cv2.cvtColor(edges, cv2.COLOR_GRAY2BGR)
-            
-            # Display frames
+            # Display frames (edges in a separate window)
             cv2.imshow('Team-Aetherion - UOWD Aerospace Machine Vision System', display_frame)
-            cv2.imshow('Edge Detection', edges_colored)
+            cv2.imshow('Edge Detection', edges)
             
             # Handle key presses
             key = cv2.waitKey(1) & 0xFF
@@ -240,6 +273,9 @@ class MachineVisionSystem:
     def cleanup(self):
         """Clean up resources"""
         self.running = False
+        if self.capture is not None:
+            self.capture.stop()
+            print(self.capture.summary())
         self.cap.release()
         cv2.destroyAllWindows()
 
@@ -283,6 +319,17 @@ class ShapeDetector:
                 return "Complex"
 
 def main():
+    parser = argparse.ArgumentParser(description="Team-Aetherion basic machine vision system")
+    add_source_arguments(parser)
+    args = parser.parse_args()
+    
+    # The source opens in the background while the banner prints
+    source = open_source(args.source, args.record, args.loop).open_async()
+    vision_system = MachineVisionSystem(source)
+    if not source.live:
+        # Recorded and generated frames are all processed, as fast as detection runs
+        vision_system.capture_drop_policy = 'block'
+    
     print("Team-Aetherion - UOWD Aerospace Machine Vision System")
     print("====================================")
     print("Features:")
@@ -294,10 +341,7 @@ def main():
     print("\nControls:")
     print("- Press 'q' to quit")
     print("- Press 's' to save screenshot")
-    print("\nStarting camera...")
-    
-    # Initialize and start the machine vision system
-    vision_system = MachineVisionSystem()
+    print(f"\nStarting {source.describe()}...")
     
     try:
         vision_system.start_detection()
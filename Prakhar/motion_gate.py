@@ -0,0 +1,95 @@
+import cv2
+import numpy as np
+
+class MotionGate:
+    """Finds the tiles of a frame that changed since they were last analysed"""
+    def __init__(self, tile_size=64, threshold=12, step=8, refresh_interval=150):
+        self.tile_size = tile_size
+        # Change in gray levels of one step x step block average above which its tile is dirty
+        self.threshold = threshold
+        # The reference is the gray frame averaged over step x step blocks
+        self.step = step
+        # Frames between full analyses, which bound the error of carried-over results
+        self.refresh_interval = refresh_interval
+        self.reference = None
+        self.since_refresh = 0
+        
+        # Statistics
+        self.frames = 0
+        self.skipped = 0
+        self.tiles = 0
+        self.dirty = 0
+    
+    def dirty_tiles(self, gray):
+        """Boolean grid of changed tiles, or None when the whole frame is to be analysed"""
+        height, width = gray.shape
+        small = cv2.resize(gray, (-(-width // self.step), -(-height // self.step)), interpolation=cv2.INTER_AREA)
+        self.frames += 1
+        if (self.reference is None or self.reference.shape != small.shape
+                or self.since_refresh >= self.refresh_interval):
+            self.reference = small
+            self.since_refresh = 0
+            return None
+        self.since_refresh += 1
+        
+        # Largest block change per tile, on a grid padded to whole tiles
+        blocks = self.tile_size // self.step
+        rows, cols = -(-small.shape[0] // blocks), -(-small.shape[1] // blocks)
+        diff = np.zeros((rows * blocks, cols * blocks), dtype=np.uint8)
+        diff[:small.shape[0], :small.shape[1]] = cv2.absdiff(small, self.reference)
+        dirty = diff.reshape(rows, blocks, cols, blocks).max(axis=(1, 3)) > self.threshold
+        
+        # Only changed tiles move the reference, so slow drift elsewhere still adds up to a change
+        changed = np.repeat(np.repeat(dirty, blocks, axis=0), blocks, axis=1)[:small.shape[0], :small.shape[1]]
+        self.reference[changed] = small[changed]
+        
+        self.tiles += dirty.size
+        self.dirty += int(dirty.sum())
+        if not dirty.any():
+            self.skipped += 1
+        return dirty
+    
+    def regions(self, dirty, shape, boxes, margin):
+        """Rectangles (x0, y0, x1, y1) around the dirty tiles and every (x, y, w, h) box they
+        reach, each grown by margin, and the indices of the boxes they reach"""
+        height, width = shape
+        tile = self.tile_size
+        _, _, stats, _ = cv2.connectedComponentsWithStats(dirty.astype(np.uint8), connectivity=8)
+        rects = [_grow((x * tile, y * tile, (x + w) * tile, (y + h) * tile), margin, width, height)
+                 for x, y, w, h in stats[1:, :4]]
+        
+        # A box reached by a rectangle is re-detected, so the rectangle must hold all of it
+        reached = set()
+        while True:
+            rects = _merge(rects)
+            new = [i for i, (x, y, w, h) in enumerate(boxes)
+                   if i not in reached and any(_overlaps(rect, (x, y, x + w, y + h)) for rect in rects)]
+            if not new:
+                return rects, reached
+            reached.update(new)
+            rects += [_grow((x, y, x + w, y + h), margin, width, height) for x, y, w, h in (boxes[i] for i in new)]
+    
+    def summary(self):
+        share = self.dirty / self.tiles if self.tiles else 1.0
+        return f"Motion gate: {self.skipped}/{self.frames} frames skipped, {share:.0%} of tiles changed"
+
+def _grow(rect, margin, width, height):
+    x0, y0, x1, y1 = rect
+    return (max(0, x0 - margin), max(0, y0 - margin), min(width, x1 + margin), min(height, y1 + margin))
+
+def _overlaps(a, b):
+    return a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]
+
+def _merge(rects):
+    """Replace overlapping rectangles by their bounding rectangle until none overlap"""
+    rects = list(rects)
+    i = 0
+    while i < len(rects):
+        for j in range(i + 1, len(rects)):
+            if _overlaps(rects[i], rects[j]):
+                a, b = rects[i], rects.pop(j)
+                rects[i] = (min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3]))
+                i = -1
+                break
+        i += 1
+    return rects
@@ -0,0 +1,180 @@
+import cv2
+import argparse
+import time
+
+from advanced_machine_vision import AdvancedMachineVision
+from capture import ThreadedCapture
+from frame_sources import open_source
+from parallel_pipeline import ParallelPipeline, available_cpus, create_pool
+
+class Stream:
+    """One source of a StreamRuntime with its own capture thread, tracker and statistics"""
+    def __init__(self, name, source, buffer_size=2):
+        self.name = name
+        self.source = source
+        # Tracking state, count history and FPS are per stream
+        self.system = AdvancedMachineVision(open_camera=False, source=source)
+        # A live stream that falls behind drops its oldest frames; recorded ones are read in full
+        drop_policy = 'drop_oldest' if getattr(source, 'live', True) else 'block'
+        self.capture = ThreadedCapture(source, buffer_size, drop_policy)
+        self.system.capture = self.capture
+        self.pipeline = None
+        
+        self.processed = 0
+        self.started = None
+        self.finished = False
+    
+    def record(self, result):
+        """Count a finished frame towards this stream's FPS and latency"""
+        self.system.calculate_fps()
+        self.capture.record_result(result[0])
+        self.processed += 1
+    
+    def exhausted(self):
+        """True once the source has ended and every frame read from it is done"""
+        return (self.capture.finished and not self.capture.buffer
+                and (self.pipeline is None or not self.pipeline.pending))
+    
+    def fps(self):
+        elapsed = time.perf_counter() - self.started if self.started else 0.0
+        return self.processed / elapsed if elapsed > 0 else 0.0
+    
+    def summary(self):
+        return f"{self.name}: {self.processed} frames at {self.fps():.1f} FPS; {self.capture.summary()}"
+
+class StreamRuntime:
+    """Detection for several frame sources in one process on a shared worker pool"""
+    def __init__(self, sources, workers=None, in_flight=2, buffer_size=2):
+        self.streams = [Stream(f"Stream {i}", source, buffer_size) for i, source in enumerate(sources)]
+        # 0 workers processes the streams in turn on the calling thread
+        self.workers = max(1, available_cpus() - 1) if workers is None else workers
+        # Frames of one stream in the pool at once; bounds how long other streams wait
+        self.in_flight = in_flight
+        self.pool = None
+        self.running = False
+    
+    def start(self):
+        """Start the capture threads and the shared worker pool"""
+        if self.workers > 0:
+            # Detection settings are shared; workers take them from the first stream
+            self.pool = create_pool(self.streams[0].system, self.workers)
+            for stream in self.streams:
+                stream.pipeline = ParallelPipeline(stream.system, pool=self.pool, slots=self.in_flight)
+        
+        self.running = True
+        for stream in self.streams:
+            stream.system.running = True
+            stream.capture.start()
+            stream.started = time.perf_counter()
+        return self
+    
+    def results(self):
+        """Yield (stream, result) as frames finish; each stream's results stay in frame order"""
+        turn = 0
+        while self.running:
+            active = [stream for stream in self.streams if not stream.finished]
+            if not active:
+                return
+            progressed = False
+            
+            # Finished frames first, so their slots are free for this round of submissions
+            for stream in active:
+                while stream.pipeline is not None and stream.pipeline.ready():
+                    result = stream.pipeline.get()
+                    stream.record(result)
+                    progressed = True
+                    yield stream, result
+            
+            # Round robin, one frame per stream per turn, starting one stream later each turn
+            for offset in range(len(active)):
+                stream = active[(turn + offset) % len(active)]
+                if stream.pipeline is not None and not stream.pipeline.has_free_slot():
+                    continue
+                ret, frame, capture_time = stream.capture.read(timeout=0)
+                if not ret:
+                    stream.finished = stream.exhausted()
+                    continue
+                
+                progressed = True
+                if stream.pipeline is not None:
+                    stream.pipeline.submit(frame, capture_time)
+                else:
+                    result = (capture_time,) + stream.system.process_frame_advanced(frame)
+                    stream.record(result)
+                    yield stream, result
+            turn += 1
+            
+            if not progressed:
+                time.sleep(0.001)
+    
+    def stop(self):
+        """Stop the captures and the pool, and release the sources"""
+        self.running = False
+        for stream in self.streams:
+            stream.system.running = False
+            stream.capture.stop()
+            if stream.pipeline is not None:
+                stream.pipeline.close()
+            stream.source.release()
+        if self.pool is not None:
+            self.pool.terminate()
+            self.pool.join()
+            self.pool = None
+    
+    def summary(self):
+        return "\n".join(stream.summary() for stream in self.streams)
+
+def main():
+    parser = argparse.ArgumentParser(description="Several cameras or recordings in one process on a shared worker pool")
+    parser.add_argument('--source', action='append',
+                        help="Camera index, video file, image directory, .rec recording or synthetic[:WIDTHxHEIGHT]; "
+                             "repeat for each stream (default: cameras 0 and 1)")
+    parser.add_argument('--workers', type=int, help="Shared detection processes (0 = in turn on this thread)")
+    parser.add_argument('--in-flight', type=int, default=2, help="Frames per stream in the pool at once")
+    parser.add_argument('--display-rate', type=float, default=15, help="Window refreshes per second per stream")
+    parser.add_argument('--headless', action='store_true', help="No windows; print statistics instead")
+    args = parser.parse_args()
+    
+    sources = [open_source(spec).open_async() for spec in (args.source or ['0', '1'])]
+    runtime = StreamRuntime(sources, args.workers, args.in_flight)
+    for stream in runtime.streams:
+        stream.system.draw_annotations = False
+    
+    print(f"Starting {len(sources)} streams on {runtime.workers} shared workers...")
+    for stream in runtime.streams:
+        print(f"  {stream.name}: {stream.source.describe()}")
+    print("Press 'q' in any window to quit")
+    
+    period = 1.0 / args.display_rate if args.display_rate > 0 else 0.0
+    last_shown = {}
+    last_report = time.perf_counter()
+    runtime.start()
+    try:
+        for stream, result in runtime.results():
+            now = time.perf_counter()
+            if args.headless:
+                if now - last_report >= 5.0:
+                    print(runtime.summary())
+                    last_report = now
+                continue
+            
+            # Only the frames that reach a window are annotated
+            if now - last_shown.get(stream.name, 0.0) < period:
+                continue
+            last_shown[stream.name] = now
+            _, frame, detected_objects, object_counts, _ = result
+            for obj in detected_objects:
+                stream.system.draw_detection(frame, obj, obj.contour)
+            cv2.imshow(f"Team-Aetherion - {stream.name}",
+                       stream.system.draw_advanced_info_panel(frame, detected_objects, object_counts))
+            if cv2.waitKey(1) & 0xFF == ord('q'):
+                break
+    except KeyboardInterrupt:
+        print("\nShutdown requested by user...")
+    finally:
+        runtime.stop()
+        cv2.destroyAllWindows()
+        print(runtime.summary())
+
+if __name__ == "__main__":
+    main()
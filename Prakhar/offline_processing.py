@@ -0,0 +1,99 @@
+import argparse
+import json
+import os
+import time
+
+from advanced_machine_vision import AdvancedMachineVision
+from capture import ThreadedCapture
+from frame_sources import VideoFileSource
+
+def process_video(path, output_path, stride=1, sample_fps=None, start=None, end=None,
+                  workers=0, buffer_size=8, flush_every=30, keyframe_interval=1):
+    """Run process_frame_advanced over a video file without any display"""
+    reader = VideoFileSource(path, stride, start, end, sample_fps)
+    if not reader.isOpened():
+        raise IOError(f"Could not open video: {path}")
+    
+    vision_system = AdvancedMachineVision(open_camera=False)
+    # Nothing is displayed, so frames are not annotated
+    vision_system.draw_annotations = False
+    vision_system.workers = workers
+    vision_system.keyframe_interval = keyframe_interval
+    
+    # Decoding runs on its own thread; 'block' keeps every sampled frame
+    decoder = ThreadedCapture(reader, buffer_size, 'block').start()
+    
+    def decoded_frames():
+        while True:
+            ret, frame, capture_time = decoder.read()
+            if not ret:
+                return
+            yield frame, capture_time
+    
+    processed = 0
+    total_objects = 0
+    start_time = time.perf_counter()
+    
+    try:
+        with open(output_path, 'w') as f:
+            for capture_time, _, detected_objects, object_counts, _ in vision_system.iter_results(decoded_frames()):
+                frame_number = reader.frame_number(processed)
+                video_time = round(frame_number / reader.fps, 3)
+                
+                # One JSON line per frame, written as soon as it is processed
+                record = {
+                    'frame': frame_number,
+                    'time': video_time,
+                    'counts': dict(object_counts),
+                    'objects': vision_system.serialize_objects(detected_objects, video_time)
+                }
+                f.write(json.dumps(record) + "\n")
+                
+                decoder.record_result(capture_time)
+                processed += 1
+                total_objects += len(detected_objects)
+                if processed % flush_every == 0:
+                    f.flush()
+    finally:
+        decoder.stop()
+        reader.release()
+    
+    elapsed = time.perf_counter() - start_time
+    return {
+        'frames': processed,
+        'objects': total_objects,
+        'seconds': elapsed,
+        'fps': processed / elapsed if elapsed > 0 else 0.0,
+        'stride': reader.stride,
+        'keyframes': vision_system.keyframes,
+        'latency': decoder.summary()
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless machine vision over recorded video")
+    parser.add_argument('videos', nargs='+', help="Video files to process")
+    parser.add_argument('--output-dir', default='.', help="Where to write <video>.detections.ndjson")
+    parser.add_argument('--stride', type=int, default=1, help="Analyse every n-th frame")
+    parser.add_argument('--sample-fps', type=float, help="Analyse at this many frames per second of video")
+    parser.add_argument('--start', type=float, help="Start time in seconds")
+    parser.add_argument('--end', type=float, help="End time in seconds")
+    parser.add_argument('--workers', type=int, default=0, help="Detection worker processes")
+    parser.add_argument('--keyframe-interval', type=int, default=1,
+                        help="Full detection every n-th frame, optical flow in between (serial only)")
+    args = parser.parse_args()
+    
+    for path in args.videos:
+        name = os.path.splitext(os.path.basename(path))[0]
+        output_path = os.path.join(args.output_dir, f"{name}.detections.ndjson")
+        
+        print(f"Processing {path}...")
+        summary = process_video(path, output_path, args.stride, args.sample_fps,
+                                args.start, args.end, args.workers, keyframe_interval=args.keyframe_interval)
+        print(f"  Frames: {summary['frames']} (stride {summary['stride']}, {summary['keyframes']} keyframes)")
+        print(f"  Objects: {summary['objects']}")
+        print(f"  Time: {summary['seconds']:.2f}s  ({summary['fps']:.1f} FPS)")
+        print(f"  {summary['latency']}")
+        print(f"  Detections written to {output_path}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,242 @@
+import cv2
+import numpy as np
+import multiprocessing as mp
+from multiprocessing import resource_tracker, shared_memory
+from collections import deque
+import argparse
+import os
+import time
+
+from edge_maps import EdgeMaps
+from scenes import synthetic_frames
+
+# Per-process state of a pool worker
+_worker = {}
+
+def available_cpus():
+    """Number of CPUs this process may run on"""
+    if hasattr(os, 'sched_getaffinity'):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+def create_pool(vision_system, workers):
+    """Worker processes that run detection with vision_system's settings"""
+    config = {name: getattr(vision_system, name) for name in ParallelPipeline.config_attributes}
+    # Workers must share our resource tracker, otherwise each one unlinks the
+    # slots it attached to when it exits (Windows has no tracker; its shared memory is freed
+    # with the last handle)
+    if os.name == 'posix':
+        resource_tracker.ensure_running()
+    return mp.Pool(workers, initializer=_init_worker, initargs=(type(vision_system), config))
+
+def _init_worker(system_class, config):
+    """Create a camera-less vision system inside a worker process"""
+    # Parallelism comes from the pool; stop OpenCV from oversubscribing cores
+    cv2.setNumThreads(1)
+    system = system_class(open_camera=False)
+    for name, value in config.items():
+        setattr(system, name, value)
+    _worker['system'] = system
+    _worker['slots'] = {}
+
+def _detect_in_slot(slot_name, shape, dtype, quality):
+    """Run detection on the frame stored in a shared-memory slot with the given quality settings;
+    returns the detections, counts and detection time in ms"""
+    slots = _worker['slots']
+    if slot_name not in slots:
+        slots[slot_name] = shared_memory.SharedMemory(name=slot_name)
+    system = _worker['system']
+    for name, value in quality.items():
+        setattr(system, name, value)
+    
+    # Detection draws in place, so the annotated frame travels back through the slot
+    frame = np.ndarray(shape, dtype=dtype, buffer=slots[slot_name].buf)
+    start = time.perf_counter()
+    detected_objects, object_counts = system.detect_objects(frame)
+    elapsed = (time.perf_counter() - start) * 1000
+    del frame
+    return detected_objects, dict(object_counts), elapsed
+
+class ParallelPipeline:
+    """Runs per-frame detection on a process pool, keeping tracking sequential"""
+    config_attributes = ('color_ranges', 'min_area', 'max_area', 'contour_mode', 'draw_annotations',
+                         'segmentation_scale', 'segmentation_refine', 'hex_statistic')
+    # Settings a quality governor changes while running; sent along with every frame
+    quality_attributes = ('segmentation_scale', 'segmentation_refine', 'hex_statistic')
+    
+    def __init__(self, vision_system, workers=None, slots_per_worker=2, pool=None, slots=None):
+        self.vision_system = vision_system
+        self.workers = workers or max(1, available_cpus() - 1)
+        # At most n_slots frames of this pipeline are in flight at once
+        self.n_slots = slots or self.workers * slots_per_worker
+        # A pool passed in is shared with other pipelines and left running by close()
+        self.pool = pool
+        self.owns_pool = pool is None
+        
+        self.slots = []
+        self.slot_size = 0
+        self.free_slots = deque()
+        # (slot index, tag, source frame, shape, dtype, quality, async result) in submission order
+        self.pending = deque()
+    
+    def start(self):
+        """Start the worker pool"""
+        if self.pool is None:
+            self.pool = create_pool(self.vision_system, self.workers)
+        return self
+    
+    def _allocate_slots(self, nbytes):
+        """Create the shared-memory frame slots sized for the first frame"""
+        for _ in range(self.n_slots):
+            self.slots.append(shared_memory.SharedMemory(create=True, size=nbytes))
+        self.slot_size = nbytes
+        self.free_slots.extend(range(self.n_slots))
+    
+    def has_free_slot(self):
+        return not self.slots or bool(self.free_slots)
+    
+    def submit(self, frame, tag=None):
+        """Copy a frame into a free slot and queue it for detection"""
+        if not self.slots:
+            self._allocate_slots(frame.nbytes)
+        if frame.nbytes > self.slot_size:
+            raise ValueError("Frame is larger than the shared-memory slots")
+        if not self.free_slots:
+            raise RuntimeError("No free frame slot; collect a result with get() first")
+        
+        slot_index = self.free_slots.popleft()
+        slot = self.slots[slot_index]
+        view = np.ndarray(frame.shape, dtype=frame.dtype, buffer=slot.buf)
+        view[...] = frame
+        del view
+        
+        result = self.pool.apply_async(_detect_in_slot, (slot.name, frame.shape, frame.dtype.str, self.quality()))
+        governor = self.governor()
+        # The last field counts the frames skipped after this one, charged to the governor with it
+        self.pending.append([slot_index, tag, frame, frame.shape, frame.dtype,
+                             None if governor is None else governor.level, result, 0])
+    
+    def skip(self):
+        """Count a frame dropped before detection as free, in frame order with the pending results"""
+        governor = self.governor()
+        if governor is None:
+            return
+        if self.pending:
+            self.pending[-1][7] += 1
+        else:
+            governor.update(0.0)
+    
+    def quality(self):
+        return {name: getattr(self.vision_system, name) for name in self.quality_attributes}
+    
+    def governor(self):
+        return getattr(self.vision_system, 'governor', None)
+    
+    def ready(self):
+        """True if the oldest pending frame has finished"""
+        return bool(self.pending) and self.pending[0][6].ready()
+    
+    def get(self):
+        """Return the oldest result as (tag, frame, tracked_objects, object_counts, edge_maps)"""
+        slot_index, tag, source, shape, dtype, level, result, skipped = self.pending.popleft()
+        try:
+            detected_objects, object_counts, detect_ms = result.get()
+            view = np.ndarray(shape, dtype=dtype, buffer=self.slots[slot_index].buf)
+            frame = view.copy()
+            del view
+        finally:
+            self.free_slots.append(slot_index)
+        
+        # Results arrive in frame order, so tracking sees the same sequence as serial mode
+        start = time.perf_counter()
+        self.vision_system.stage_clock.start()
+        tracked_objects = self.vision_system.object_tracking(detected_objects)
+        self.vision_system.stage_clock.lap('tracking')
+        self.vision_system.keyframes += 1
+        edge_maps = EdgeMaps(frame=source)
+        counts = self.vision_system.record_counts(object_counts)
+        
+        # Frames submitted before a quality change, and those skipped after them, would be
+        # charged to the new level
+        governor = self.governor()
+        if governor is not None and level == governor.level:
+            governor.update(detect_ms + (time.perf_counter() - start) * 1000)
+            for _ in range(skipped):
+                if governor.level == level:
+                    governor.update(0.0)
+        return tag, frame, tracked_objects, counts, edge_maps
+    
+    def process(self, frames):
+        """Yield results in order for an iterable of (frame, tag) pairs"""
+        for frame, tag in frames:
+            if not self.has_free_slot():
+                yield self.get()
+            self.submit(frame, tag)
+            while self.ready():
+                yield self.get()
+        
+        while self.pending:
+            yield self.get()
+    
+    def close(self):
+        """Stop the workers and release the shared memory"""
+        if self.pool is not None and self.owns_pool:
+            self.pool.terminate()
+            self.pool.join()
+        self.pool = None
+        self.pending.clear()
+        for slot in self.slots:
+            slot.close()
+            slot.unlink()
+        self.slots = []
+        self.free_slots.clear()
+
+def benchmark_workers(worker_counts, frames=60, width=1920, height=1080):
+    """Frames per second of serial processing and of each pool size"""
+    from advanced_machine_vision import AdvancedMachineVision
+    
+    scene = list(synthetic_frames(frames, width, height))
+    results = {}
+    
+    for workers in worker_counts:
+        system = AdvancedMachineVision(open_camera=False)
+        start = time.perf_counter()
+        if workers == 0:
+            for frame in scene:
+                system.process_frame_advanced(frame.copy())
+        else:
+            pipeline = ParallelPipeline(system, workers).start()
+            try:
+                # Warm the pool up so process start-up is not counted
+                for _ in pipeline.process([(scene[0], None)] * workers):
+                    pass
+                system.tracking_objects = {}
+                start = time.perf_counter()
+                for _ in pipeline.process((frame, None) for frame in scene):
+                    pass
+            finally:
+                pipeline.close()
+        results[workers] = frames / (time.perf_counter() - start)
+    
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Throughput of the multi-process frame pipeline")
+    parser.add_argument('--workers', type=int, nargs='+',
+                        default=sorted({0, 1, 2, 4, available_cpus()}))
+    parser.add_argument('--frames', type=int, default=60)
+    parser.add_argument('--width', type=int, default=1920)
+    parser.add_argument('--height', type=int, default=1080)
+    args = parser.parse_args()
+    
+    results = benchmark_workers(args.workers, args.frames, args.width, args.height)
+    
+    print(f"\nThroughput at {args.width}x{args.height} ({args.frames} frames):")
+    serial = results.get(0)
+    for workers, fps in results.items():
+        label = "serial" if workers == 0 else f"{workers} workers"
+        speedup = f"  ({fps / serial:.2f}x)" if serial else ""
+        print(f"  {label:>12}: {fps:7.1f} FPS{speedup}")
+
+if __name__ == "__main__":
+    main()
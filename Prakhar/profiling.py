@@ -0,0 +1,187 @@
+import numpy as np
+import math
+import threading
+import time
+
+class StageClock:
+    """Accumulates the time spent in each named stage of one frame"""
+    def __init__(self):
+        self.stages = {}
+        self.counters = {}
+        self.last = None
+    
+    def start(self):
+        """Begin a new frame"""
+        self.stages = {}
+        self.counters = {}
+        self.last = time.perf_counter()
+    
+    def lap(self, stage):
+        """Charge the time since the previous lap to `stage`"""
+        now = time.perf_counter()
+        self.stages[stage] = self.stages.get(stage, 0.0) + (now - self.last)
+        self.last = now
+    
+    def count(self, name, value=1):
+        """Add to a per-frame counter such as buffer allocations"""
+        self.counters[name] = self.counters.get(name, 0) + value
+    
+    def frame_ms(self):
+        """Stage times of the current frame in milliseconds"""
+        return {stage: seconds * 1000 for stage, seconds in self.stages.items()}
+
+class LatencyHistogram:
+    """Fixed log-spaced histogram of durations; percentiles are exact to one bin"""
+    def __init__(self, low=0.01, high=10000.0, bins_per_decade=50):
+        self.low = low
+        self.scale = bins_per_decade / math.log(10)
+        # Bin 0 holds durations below low, the last bin everything above high
+        self.bins = int(math.ceil(math.log(high / low) * self.scale)) + 2
+        self.counts = np.zeros(self.bins, dtype=np.int64)
+        self.upper_edges = low * np.exp(np.arange(self.bins) / self.scale)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+    
+    def record(self, ms):
+        if ms < self.low:
+            index = 0
+        else:
+            index = min(self.bins - 1, 1 + int(math.log(ms / self.low) * self.scale))
+        self.counts[index] += 1
+        self.count += 1
+        self.total += ms
+        if ms > self.max:
+            self.max = ms
+    
+    def percentiles(self, percentiles=(50, 95, 99)):
+        """Upper edge of the bin holding each percentile, capped at the largest duration seen"""
+        if not self.count:
+            return {p: 0.0 for p in percentiles}
+        cumulative = np.cumsum(self.counts)
+        ranks = [max(1, math.ceil(p / 100 * self.count)) for p in percentiles]
+        indices = np.searchsorted(cumulative, ranks)
+        return {p: min(float(self.upper_edges[index]), self.max) for p, index in zip(percentiles, indices)}
+    
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+class StageTimers(StageClock):
+    """Stage clock that keeps a latency histogram per stage across frames"""
+    def __init__(self, total_stage='frame'):
+        super().__init__()
+        self.total_stage = total_stage
+        self.histograms = {}
+        # Counter totals over all finished frames
+        self.counter_totals = {}
+        self.frames = 0
+        self.lock = threading.Lock()
+    
+    def record(self, stage, ms):
+        """Add one duration to a stage's histogram"""
+        with self.lock:
+            histogram = self.histograms.get(stage)
+            if histogram is None:
+                histogram = self.histograms[stage] = LatencyHistogram()
+            histogram.record(ms)
+    
+    def finish(self):
+        """Fold the current frame's stage times, and their sum, into the histograms"""
+        if not self.stages:
+            return
+        frame_ms = self.frame_ms()
+        for stage, ms in frame_ms.items():
+            self.record(stage, ms)
+        self.record(self.total_stage, sum(frame_ms.values()))
+        with self.lock:
+            for name, value in self.counters.items():
+                self.counter_totals[name] = self.counter_totals.get(name, 0) + value
+        self.stages = {}
+        self.counters = {}
+        self.frames += 1
+    
+    def percentiles(self, percentiles=(50, 95, 99)):
+        """{stage: {percentile: ms}} with the total first, then slowest p95 first"""
+        with self.lock:
+            table = {stage: histogram.percentiles(percentiles) for stage, histogram in self.histograms.items()}
+        order = sorted(table, key=lambda stage: (stage != self.total_stage, -table[stage][percentiles[1]]))
+        return {stage: table[stage] for stage in order}
+    
+    def counters_per_frame(self):
+        """Mean of each counter over the finished frames"""
+        with self.lock:
+            return {name: total / max(1, self.frames) for name, total in self.counter_totals.items()}
+    
+    def to_dict(self):
+        """JSON-ready percentiles, mean, max and count per stage, and counters per frame"""
+        table = self.percentiles()
+        counters = self.counters_per_frame()
+        with self.lock:
+            result = {stage: {'p50': values[50], 'p95': values[95], 'p99': values[99],
+                              'mean': self.histograms[stage].mean(), 'max': self.histograms[stage].max,
+                              'count': self.histograms[stage].count}
+                      for stage, values in table.items()}
+        if counters:
+            result['counters per frame'] = counters
+        return result
+    
+    def report(self, title):
+        """Multi-line p50/p95/p99 table"""
+        lines = [f"{title} over {self.frames} frames (ms):",
+                 f"  {'stage':<12} {'p50':>8} {'p95':>8} {'p99':>8}"]
+        for stage, values in self.percentiles().items():
+            lines.append(f"  {stage:<12} {values[50]:8.2f} {values[95]:8.2f} {values[99]:8.2f}")
+        counters = self.counters_per_frame()
+        if counters:
+            lines.append("  per frame: " + ", ".join(f"{name} {value:.2f}" for name, value in counters.items()))
+        return "\n".join(lines)
+
+class NullClock:
+    """Stage clock that records nothing"""
+    frames = 0
+    
+    def start(self):
+        pass
+    
+    def lap(self, stage):
+        pass
+    
+    def count(self, name, value=1):
+        pass
+    
+    def frame_ms(self):
+        return {}
+    
+    def record(self, stage, ms):
+        pass
+    
+    def finish(self):
+        pass
+    
+    def percentiles(self, percentiles=(50, 95, 99)):
+        return {}
+    
+    def to_dict(self):
+        return {}
+
+NULL_CLOCK = NullClock()
+
+def benchmark_overhead(frames=20000, stages=('conversion', 'color', 'threshold', 'contours', 'shape', 'drawing')):
+    """Microseconds per frame spent timing and recording `stages` laps"""
+    results = {}
+    for name, clock in (('off', NULL_CLOCK), ('on', StageTimers())):
+        start = time.perf_counter()
+        for _ in range(frames):
+            clock.start()
+            for stage in stages:
+                clock.lap(stage)
+            clock.finish()
+        results[name] = (time.perf_counter() - start) * 1e6 / frames
+    return results
+
+def main():
+    results = benchmark_overhead()
+    print(f"\nStage timing overhead per frame (6 stages): off {results['off']:.2f} us, on {results['on']:.2f} us")
+
+if __name__ == "__main__":
+    main()
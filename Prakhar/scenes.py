@@ -0,0 +1,86 @@
+import cv2
+import numpy as np
+import contextlib
+import io
+import threading
+
+_sprites = []
+_demo = []
+# redirect_stdout swaps sys.stdout for every thread, so concurrent callers must take turns
+_demo_lock = threading.Lock()
+
+def dotted_background(width, height, dark=60, light=200):
+    """Fine dot grid; it breaks up the background so adaptive thresholding isolates objects"""
+    base = np.full((height, width, 3), dark, dtype=np.uint8)
+    rows, cols = np.mgrid[0:height, 0:width]
+    base[((rows % 8) < 4) & ((cols % 8) < 4)] = light
+    return base
+
+def demo_image():
+    """The demo scene from demo.py, without its console listing"""
+    from demo import create_demo_objects
+    
+    with _demo_lock:
+        if not _demo:
+            with contextlib.redirect_stdout(io.StringIO()):
+                _demo.append(create_demo_objects())
+        return _demo[0].copy()
+
+def demo_sprites():
+    """The demo objects cut out as (image, mask) pairs"""
+    if not _sprites:
+        image = demo_image()
+        objects = (image.min(axis=2) < 250).astype(np.uint8)
+        count, labels, stats, _ = cv2.connectedComponentsWithStats(objects)
+        for label in range(1, count):
+            x, y, w, h = stats[label, :4]
+            mask = labels[y:y + h, x:x + w] == label
+            _sprites.append((image[y:y + h, x:x + w].copy(), mask))
+    return _sprites
+
+def synthetic_scene(width, height, objects, seed=0, background='dotted'):
+    """Demo objects repeated on a grid at any resolution and object count"""
+    rng = np.random.default_rng(seed)
+    if background == 'dotted':
+        scene = dotted_background(width, height)
+    else:
+        # Plain dark background for the basic system's global threshold
+        scene = np.full((height, width, 3), 20, dtype=np.uint8)
+    
+    # One grid cell per object; sprites fill about 60% of a cell
+    columns = max(1, int(np.ceil(np.sqrt(objects * width / height))))
+    rows = int(np.ceil(objects / columns))
+    cell_w, cell_h = width / columns, height / rows
+    size = int(np.clip(0.6 * min(cell_w, cell_h), 12, 160))
+    
+    sprites = demo_sprites()
+    for i in range(objects):
+        image, mask = sprites[rng.integers(len(sprites))]
+        scale = size / max(image.shape[:2])
+        w = max(1, int(image.shape[1] * scale))
+        h = max(1, int(image.shape[0] * scale))
+        image = cv2.resize(image, (w, h), interpolation=cv2.INTER_NEAREST)
+        mask = cv2.resize(mask.astype(np.uint8), (w, h), interpolation=cv2.INTER_NEAREST).astype(bool)
+        
+        # Cell center, jittered within the cell's slack
+        row, column = divmod(i, columns)
+        slack_x = max(0, int(cell_w - w) // 2)
+        slack_y = max(0, int(cell_h - h) // 2)
+        x = int(column * cell_w + (cell_w - w) / 2) + int(rng.integers(-slack_x // 2, slack_x // 2 + 1))
+        y = int(row * cell_h + (cell_h - h) / 2) + int(rng.integers(-slack_y // 2, slack_y // 2 + 1))
+        x = int(np.clip(x, 0, width - w))
+        y = int(np.clip(y, 0, height - h))
+        scene[y:y + h, x:x + w][mask] = image[mask]
+    
+    return scene
+
+def synthetic_frames(count, width=1920, height=1080):
+    """Demo scene on a dotted background, scaled and shifted a little every frame"""
+    demo = cv2.resize(demo_image(), (width, height), interpolation=cv2.INTER_NEAREST)
+    
+    base = dotted_background(width, height)
+    objects = demo.min(axis=2) < 250
+    base[objects] = demo[objects]
+    
+    for i in range(count):
+        yield np.roll(base, 8 * i, axis=1)
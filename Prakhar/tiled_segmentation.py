@@ -0,0 +1,76 @@
+import cv2
+import numpy as np
+
+from frame_context import lookup
+
+def strip_bounds(height, count):
+    """(top, bottom) rows of up to count horizontal strips covering height rows"""
+    edges = np.linspace(0, height, count + 1).astype(int)
+    return [(int(top), int(bottom)) for top, bottom in zip(edges[:-1], edges[1:]) if bottom > top]
+
+def tiled_mask(gray, make_mask, executor, count, halo, out=None):
+    """make_mask(gray) computed in horizontal strips on executor; each strip is extended by halo
+    rows on both sides, the rows make_mask reads around a pixel, so the result is identical"""
+    height = gray.shape[0]
+    if out is None:
+        out = np.empty_like(gray)
+    
+    def run(bounds):
+        top, bottom = bounds
+        start, end = max(0, top - halo), min(height, bottom + halo)
+        out[top:bottom] = make_mask(gray[start:end])[top - start:bottom - start]
+    
+    list(executor.map(run, strip_bounds(height, count)))
+    return out
+
+def tiled_lookup(table, labels, executor, count, out, index):
+    """frame_context.lookup computed in horizontal strips on executor"""
+    def run(bounds):
+        top, bottom = bounds
+        lookup(table, labels[top:bottom], out[top:bottom], index[top:bottom])
+    
+    list(executor.map(run, strip_bounds(labels.shape[0], count)))
+    return out
+
+def enclosing_rows(stats, ids, chunk=1024):
+    """First and last row of each component together with every component whose bounding box
+    holds its own; only those can enclose it and hide it from cv2.RETR_EXTERNAL"""
+    left, top = stats[ids, cv2.CC_STAT_LEFT], stats[ids, cv2.CC_STAT_TOP]
+    right, bottom = left + stats[ids, cv2.CC_STAT_WIDTH], top + stats[ids, cv2.CC_STAT_HEIGHT]
+    starts = np.empty(len(ids), dtype=np.int64)
+    ends = np.empty(len(ids), dtype=np.int64)
+    # Pairwise box tests in chunks, so memory stays bounded on crowded frames
+    for i in range(0, len(ids), chunk):
+        part = slice(i, i + chunk)
+        inside = ((left[part, None] >= left) & (right[part, None] <= right)
+                  & (top[part, None] >= top) & (bottom[part, None] <= bottom))
+        starts[part] = np.where(inside, top, top.max()).min(axis=1)
+        ends[part] = np.where(inside, bottom, 0).max(axis=1)
+    return starts, ends
+
+def tiled_contours(mask, labels, stats, keep, executor, count):
+    """External contours of the components flagged in keep, traced in horizontal strips on
+    executor; the same contours in the same order as cv2.findContours on the whole mask"""
+    ids = np.flatnonzero(keep)
+    if not len(ids):
+        return []
+    starts, ends = enclosing_rows(stats, ids)
+    
+    def trace(bounds):
+        # A strip traces the components whose enclosing rows start in it, over all of those rows
+        top, bottom = bounds
+        owned = (starts >= top) & (starts < bottom)
+        if not owned.any():
+            return []
+        is_owned = np.zeros(len(stats), dtype=bool)
+        is_owned[ids[owned]] = True
+        end = int(ends[owned].max())
+        contours = cv2.findContours(mask[top:end], cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE, offset=(0, top))[0]
+        # Components cut by the strip's edges belong to other strips; a contour starts on its
+        # component's first pixel in raster order, which identifies the component
+        return [contour for contour in contours if is_owned[labels[contour[0, 0, 1], contour[0, 0, 0]]]]
+    
+    contours = [contour for part in executor.map(trace, strip_bounds(mask.shape[0], count)) for contour in part]
+    # cv2.findContours lists contours by first pixel, last in raster order first
+    contours.sort(key=lambda contour: (int(contour[0, 0, 1]), int(contour[0, 0, 0])), reverse=True)
+    return contours
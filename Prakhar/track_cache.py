@@ -0,0 +1,82 @@
+from tracking import match_detections
+
+class TrackAttributeCache:
+    """Shape, color and hex of each track, reused until its object changes"""
+    def __init__(self, bbox_tolerance=4, area_tolerance=0.05, intensity_tolerance=8, refresh_interval=30,
+                 capacity=512):
+        # Pixels any bbox coordinate may move from where the attributes were computed
+        self.bbox_tolerance = bbox_tolerance
+        # Share of the area it may grow or shrink by
+        self.area_tolerance = area_tolerance
+        # Gray levels the mean intensity of its bbox may change by
+        self.intensity_tolerance = intensity_tolerance
+        # Frames an entry is reused before the object is classified again regardless
+        self.refresh_interval = refresh_interval
+        # Tracks kept at most; the longest-reused entries are dropped first
+        self.capacity = capacity
+        self.entries = {}
+        # Detections of the current frame with their entries, filed under track IDs by update()
+        self.pending = []
+        
+        # Statistics
+        self.lookups = 0
+        self.hits = 0
+        self.evictions = 0
+    
+    def predict(self, centers, tracks, distance, mode):
+        """Track ID each center is expected to continue (None for a new object), matched as the
+        tracker matches them; the tracker still makes the final assignment"""
+        track_ids = list(tracks)
+        matches = match_detections(centers, [tracks[track_id]['center'] for track_id in track_ids], distance, mode)
+        return [track_ids[match] if match >= 0 else None for match in matches]
+    
+    def lookup(self, track_id, bbox, area, intensity):
+        """Entry of track_id if its object is still within tolerance of where it was classified, else None"""
+        self.lookups += 1
+        entry = self.entries.get(track_id)
+        if entry is None or entry['reused'] >= self.refresh_interval:
+            return None
+        if (max(abs(a - b) for a, b in zip(bbox, entry['bbox'])) > self.bbox_tolerance
+                or abs(area - entry['area']) > self.area_tolerance * entry['area']
+                or abs(intensity - entry['intensity']) > self.intensity_tolerance):
+            return None
+        self.hits += 1
+        return entry
+    
+    def add(self, detection, intensity, entry=None):
+        """Queue a detection with the entry it reused, or as a new entry if it was classified"""
+        reused = entry is not None
+        if not reused:
+            entry = {'bbox': detection['bbox'], 'area': detection['area'], 'intensity': intensity, 'reused': 0,
+                     'attributes': (detection['shape'], detection['color'], detection['hex'],
+                                    detection.get('median_color'))}
+        self.pending.append((detection, entry, reused))
+    
+    def mark(self):
+        """State to return to with rollback() if the detections queued from here on are discarded"""
+        return len(self.pending), self.lookups, self.hits
+    
+    def rollback(self, mark):
+        pending, self.lookups, self.hits = mark
+        del self.pending[pending:]
+    
+    def update(self, tracked_objects):
+        """File the queued entries under the IDs the tracker gave their detections and drop the
+        entries of tracks that ended"""
+        entries = {obj['id']: self.entries[obj['id']] for obj in tracked_objects if obj['id'] in self.entries}
+        # Reuse counts only once the tracker has taken the frame's detections
+        for detection, entry, reused in self.pending:
+            entry['reused'] += reused
+            entries[detection['id']] = entry
+        self.pending = []
+        
+        if len(entries) > self.capacity:
+            kept = sorted(entries, key=lambda track_id: entries[track_id]['reused'])[:self.capacity]
+            entries = {track_id: entries[track_id] for track_id in kept}
+        self.evictions += len(set(self.entries) - set(entries))
+        self.entries = entries
+    
+    def summary(self):
+        share = self.hits / self.lookups if self.lookups else 0.0
+        return (f"Track attribute cache: {share:.0%} of {self.lookups} lookups reused, "
+                f"{len(self.entries)} tracks, {self.evictions} evicted")
@@ -0,0 +1,200 @@
+import numpy as np
+import time
+
+# Grid cell keys pack (cx, cy) into one integer; cy must stay within +-2^20 cells
+_KEY_SHIFT = 1 << 21
+
+def linear_sum_assignment(cost):
+    """Minimum-cost perfect assignment of a square cost matrix (Hungarian method)"""
+    # Returns col_of_row: row i is assigned to column col_of_row[i]
+    n = cost.shape[0]
+    # Potentials and matching are 1-based with a virtual column 0
+    u = np.zeros(n + 1)
+    v = np.zeros(n + 1)
+    row_of_col = np.zeros(n + 1, dtype=np.int64)
+    way = np.zeros(n + 1, dtype=np.int64)
+    
+    for row in range(1, n + 1):
+        row_of_col[0] = row
+        col = 0
+        min_slack = np.full(n + 1, np.inf)
+        used = np.zeros(n + 1, dtype=bool)
+        
+        while True:
+            used[col] = True
+            current_row = row_of_col[col]
+            free = ~used
+            free[0] = False
+            
+            # Relax the slack of every unused column at once
+            reduced = cost[current_row - 1] - u[current_row] - v[1:]
+            better = free[1:] & (reduced < min_slack[1:])
+            min_slack[1:][better] = reduced[better]
+            way[1:][better] = col
+            
+            candidates = np.flatnonzero(free)
+            next_col = candidates[np.argmin(min_slack[candidates])]
+            delta = min_slack[next_col]
+            
+            u[row_of_col[used]] += delta
+            v[used] -= delta
+            min_slack[free] -= delta
+            
+            col = next_col
+            if row_of_col[col] == 0:
+                break
+        
+        # Flip the augmenting path
+        while col:
+            previous = way[col]
+            row_of_col[col] = row_of_col[previous]
+            col = previous
+    
+    col_of_row = np.empty(n, dtype=np.int64)
+    col_of_row[row_of_col[1:] - 1] = np.arange(n)
+    return col_of_row
+
+def candidate_pairs(points_a, points_b, radius):
+    """Index pairs (i, j) and distances with |a_i - b_j| < radius, via a uniform grid"""
+    empty = (np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), np.empty(0))
+    if len(points_a) == 0 or len(points_b) == 0:
+        return empty
+    
+    cells_a = np.floor(points_a / radius).astype(np.int64)
+    cells_b = np.floor(points_b / radius).astype(np.int64)
+    keys_b = cells_b[:, 0] * _KEY_SHIFT + cells_b[:, 1]
+    order = np.argsort(keys_b, kind='stable')
+    sorted_keys = keys_b[order]
+    
+    rows = []
+    cols = []
+    for dx in (-1, 0, 1):
+        for dy in (-1, 0, 1):
+            keys = (cells_a[:, 0] + dx) * _KEY_SHIFT + cells_a[:, 1] + dy
+            lo = np.searchsorted(sorted_keys, keys, side='left')
+            counts = np.searchsorted(sorted_keys, keys, side='right') - lo
+            total = counts.sum()
+            if total == 0:
+                continue
+            # Expand each [lo, lo + count) range without a Python loop
+            starts = np.repeat(lo, counts)
+            offsets = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+            rows.append(np.repeat(np.arange(len(points_a)), counts))
+            cols.append(order[starts + offsets])
+    
+    if not rows:
+        return empty
+    rows = np.concatenate(rows)
+    cols = np.concatenate(cols)
+    diff = points_a[rows] - points_b[cols]
+    distances = np.sqrt(diff[:, 0]**2 + diff[:, 1]**2)
+    inside = distances < radius
+    return rows[inside], cols[inside], distances[inside]
+
+def greedy_match(centers, track_centers, max_distance):
+    """Original matching: each detection takes its nearest track, IDs may repeat"""
+    matches = np.full(len(centers), -1, dtype=np.int64)
+    if len(centers) == 0 or len(track_centers) == 0:
+        return matches
+    
+    diff = centers[:, None, :] - track_centers[None, :, :]
+    distances = np.sqrt(diff[..., 0]**2 + diff[..., 1]**2)
+    distances[distances >= max_distance] = np.inf
+    
+    # argmin returns the first minimum, like the strict '<' scan it replaces
+    nearest = np.argmin(distances, axis=1)
+    found = np.isfinite(distances[np.arange(len(centers)), nearest])
+    matches[found] = nearest[found]
+    return matches
+
+def optimal_match(centers, track_centers, max_distance):
+    """Globally optimal one-to-one matching within the distance gate"""
+    matches = np.full(len(centers), -1, dtype=np.int64)
+    rows, cols, distances = candidate_pairs(centers, track_centers, max_distance)
+    if len(rows) == 0:
+        return matches
+    
+    # A detection and a track that only see each other are matched directly
+    row_degree = np.bincount(rows, minlength=len(centers))
+    col_degree = np.bincount(cols, minlength=len(track_centers))
+    isolated = (row_degree[rows] == 1) & (col_degree[cols] == 1)
+    matches[rows[isolated]] = cols[isolated]
+    rows, cols, distances = rows[~isolated], cols[~isolated], distances[~isolated]
+    
+    # Split the remaining pairs into independent groups (union-find over detections and tracks)
+    n = len(centers)
+    parent = list(range(n + len(track_centers)))
+    
+    def find(node):
+        while parent[node] != node:
+            parent[node] = parent[parent[node]]
+            node = parent[node]
+        return node
+    
+    for row, col in zip(rows.tolist(), cols.tolist()):
+        a, b = find(row), find(n + col)
+        if a != b:
+            parent[a] = b
+    
+    groups = {}
+    for index, (row, col) in enumerate(zip(rows.tolist(), cols.tolist())):
+        groups.setdefault(find(row), []).append(index)
+    
+    for pair_indices in groups.values():
+        pair_indices = np.array(pair_indices)
+        group_rows, local_rows = np.unique(rows[pair_indices], return_inverse=True)
+        group_cols, local_cols = np.unique(cols[pair_indices], return_inverse=True)
+        
+        # Square problem where a pair outside the gate costs the gate, i.e. stays unmatched
+        n_rows, n_cols = len(group_rows), len(group_cols)
+        size = max(n_rows, n_cols)
+        cost = np.full((size, size), float(max_distance))
+        cost[local_rows, local_cols] = distances[pair_indices]
+        
+        assigned = linear_sum_assignment(cost)[:n_rows]
+        real = (assigned < n_cols) & (cost[np.arange(n_rows), assigned] < max_distance)
+        matches[group_rows[real]] = group_cols[assigned[real]]
+    
+    return matches
+
+def match_detections(centers, track_centers, max_distance, mode='optimal'):
+    """Track index matched to each detection, or -1 for a new object"""
+    centers = np.asarray(centers, dtype=np.float64).reshape(-1, 2)
+    track_centers = np.asarray(track_centers, dtype=np.float64).reshape(-1, 2)
+    if mode == 'greedy':
+        return greedy_match(centers, track_centers, max_distance)
+    if mode == 'optimal':
+        return optimal_match(centers, track_centers, max_distance)
+    raise ValueError(f"Unknown tracking mode: {mode}")
+
+def benchmark_tracking(object_counts=(10, 50, 200, 500), frames=20, width=1920, height=1080):
+    """Matching time per frame and duplicate-ID rate of each mode on jittered points"""
+    rng = np.random.default_rng(0)
+    results = []
+    
+    for count in object_counts:
+        # Objects spaced about like real blobs, jittered a few pixels per frame
+        points = rng.random((count, 2)) * [width, height]
+        for mode in ('greedy', 'optimal'):
+            elapsed = 0.0
+            duplicates = 0
+            previous = points
+            for _ in range(frames):
+                current = previous + rng.normal(0, 4, previous.shape)
+                start = time.perf_counter()
+                matches = match_detections(current, previous, 50, mode)
+                elapsed += time.perf_counter() - start
+                matched = matches[matches >= 0]
+                duplicates += len(matched) - len(np.unique(matched))
+                previous = current
+            results.append((count, mode, elapsed * 1000 / frames, duplicates / frames))
+    
+    return results
+
+def main():
+    print("\nTracking assignment per frame:")
+    for count, mode, ms, duplicates in benchmark_tracking():
+        print(f"  {count:4d} objects  {mode:>8}: {ms:7.2f} ms, duplicate IDs per frame: {duplicates:.2f}")
+
+if __name__ == "__main__":
+    main()